@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+CPU cost of broadcasting one message against the number of subscribers on its thread.
+
+Each subscriber is a Subscription registered on one thread, as a connected
+StreamThreadMessages call would be. "broadcast" is the time SendMessage's
+_broadcast_message takes to fan the message out, which encodes the frame once
+and hands every stream the same bytes. "per-stream encode" is what the streams
+would spend on top of that if each one serialized the frame itself, as they did
+before frames were shared.
+
+    python -m benchmarks.broadcast_fanout
+    python -m benchmarks.broadcast_fanout --subscribers 10 100 1000 2000 10000 --runs 50
+"""
+
+from benchmarks import common
+
+import argparse
+import time
+
+from messenger.generated import messaging_pb2
+from messenger.services.messaging_service import MessagingService
+from messenger.services.subscriptions import Subscription
+
+THREAD_ID = 1
+SENDER_ID = 1
+
+def cpu_time(function):
+    started = time.process_time()
+    function()
+    return time.process_time() - started
+
+def drain(subscriptions):
+    for subscription in subscriptions:
+        while subscription.depth:
+            subscription.get()
+
+def measure(service, subscribers, runs):
+    # (broadcast seconds, per-stream encode seconds), the best of runs
+    subscriptions = [Subscription(user_id, max_size=runs + 1) for user_id in range(2, subscribers + 2)]
+    for subscription in subscriptions:
+        service._subscribe(THREAD_ID, subscription)
+
+    message_proto = messaging_pb2.Message(
+        content="x" * 200,
+        sender_id=SENDER_ID,
+        sender_username="sender",
+        created_at=int(time.time()),
+        thread_id=THREAD_ID
+    )
+
+    broadcast = []
+    encode = []
+    try:
+        for run in range(runs):
+            message_proto.id = run + 1
+            broadcast.append(cpu_time(
+                lambda: service._broadcast_message(THREAD_ID, message_proto, exclude_sender_id=SENDER_ID)
+            ))
+            response = messaging_pb2.MessageStreamResponse(new_message=message_proto)
+            encode.append(cpu_time(
+                lambda: [response.SerializeToString() for _ in subscriptions]
+            ))
+            drain(subscriptions)
+    finally:
+        for subscription in subscriptions:
+            service._unsubscribe(THREAD_ID, subscription)
+    return min(broadcast), min(encode)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100, 1000, 2000, 10000])
+    parser.add_argument("--runs", type=int, default=20, help="broadcasts per subscriber count, the fastest is reported")
+    args = parser.parse_args()
+
+    common.setup_database()
+    service = MessagingService()
+
+    print(f"{'subscribers':>11}  {'broadcast':>10}  {'per-stream encode':>17}")
+    for subscribers in args.subscribers:
+        broadcast, encode = measure(service, subscribers, args.runs)
+        print(f"{subscribers:>11}  {broadcast * 1000:>8.3f}ms  {encode * 1000:>15.3f}ms")
+
+    service.read_markers.stop()
+
+if __name__ == "__main__":
+    main()
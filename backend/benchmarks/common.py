@@ -0,0 +1,64 @@
+"""
+Shared setup for the benchmarks in this directory.
+Run them from backend/ as modules, e.g. python -m benchmarks.idle_streams --help.
+They use DATABASE_URL when it is set and a throwaway SQLite database otherwise.
+"""
+
+import os
+import tempfile
+
+# must be set before messenger.config.database creates the engine
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "messenger_bench.db")
+# the metrics logger and replica bus would only add noise to the measurements
+os.environ.setdefault("METRICS_LOG_INTERVAL_SECONDS", "0")
+
+import time
+import uuid
+import jwt
+from sqlalchemy import insert
+from messenger.config.database import DATABASE_URL, engine, init_db, session_scope
+from messenger.models import User
+from messenger.utils.auth import JWT_SECRET, JWT_ALGORITHM
+
+class Context:
+    # stands in for grpc.ServicerContext when calling a service directly
+    def __init__(self):
+        self.code = None
+        self.details = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+def setup_database():
+    init_db()
+    print(f"database: {engine.dialect.name} ({DATABASE_URL.rsplit('@', 1)[-1]})")
+
+def create_users(count, prefix="bench"):
+    # count new users with unique names, returns [(user_id, username, token)]
+    run = uuid.uuid4().hex[:8]
+    usernames = [f"{prefix}_{run}_{i}" for i in range(count)]
+    with session_scope() as db:
+        db.execute(insert(User), [{"username": username, "password_hash": "x"} for username in usernames])
+        db.commit()
+        ids = dict(db.query(User.username, User.id).filter(User.username.in_(usernames)))
+    return [(ids[username], username, token(ids[username], username)) for username in usernames]
+
+def token(user_id, username, expires_in=24 * 3600):
+    return jwt.encode(
+        {"user_id": user_id, "username": username, "exp": int(time.time()) + expires_in},
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM
+    )
+
+def best_of(runs, function):
+    # fastest of runs calls to function, in seconds
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+CreateThread time against the number of participants, before and after the
+bulk-insert write.
+
+"before" is the write CreateThread used to do: load full User rows, look the
+caller up with a second query, add the thread and one ThreadParticipant per
+member through the ORM, commit, then reload the thread proto with
+_thread_to_proto. "after" is the current CreateThread handler. Threads are
+named, so neither takes the DM path.
+
+    python -m benchmarks.create_thread
+    python -m benchmarks.create_thread --participants 2 50 500 5000 --runs 5
+"""
+
+from benchmarks import common
+
+import argparse
+from sqlalchemy import event
+
+from messenger.config.database import engine, session_scope
+from messenger.generated import messaging_pb2
+from messenger.models import Thread, ThreadParticipant, User
+from messenger.services.messaging_service import MessagingService
+
+def create_before(service, user_id, usernames, name):
+    with session_scope() as db:
+        participant_users = db.query(User).filter(User.username.in_(usernames)).all()
+        current_user = db.query(User).filter(User.id == user_id).first()
+        if current_user not in participant_users:
+            participant_users.append(current_user)
+
+        new_thread = Thread(name=name)
+        new_thread.participants = [ThreadParticipant(user_id=user.id) for user in participant_users]
+        db.add(new_thread)
+        db.commit()
+
+        return service._thread_to_proto(new_thread, db)
+
+def create_after(service, token, usernames, name):
+    response = service.CreateThread(messaging_pb2.CreateThreadRequest(
+        token=token,
+        participant_usernames=usernames,
+        name=name
+    ), common.Context())
+    assert response.success, response.message
+    return response.thread
+
+def statements(function):
+    executed = []
+    def count(*args):
+        executed.append(1)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        function()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return len(executed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--participants", type=int, nargs="+", default=[2, 50, 500, 5000])
+    parser.add_argument("--runs", type=int, default=3, help="threads created per size and path, the fastest is reported")
+    args = parser.parse_args()
+
+    common.setup_database()
+    service = MessagingService()
+    users = common.create_users(max(args.participants))
+    creator_id, _, creator_token = users[0]
+    service.users.warm()
+
+    print(f"{'participants':>12}  {'before':>18}  {'after':>18}")
+    for participants in args.participants:
+        # the creator is always added, so the others make up the rest
+        usernames = [username for _, username, _ in users[1:participants]]
+        before = lambda: create_before(service, creator_id, usernames, "bench")
+        after = lambda: create_after(service, creator_token, usernames, "bench")
+
+        results = []
+        for create in (before, after):
+            seconds = common.best_of(args.runs, create)
+            results.append(f"{seconds * 1000:>8.1f}ms {statements(create):>4} st")
+        print(f"{participants:>12}  {results[0]:>18}  {results[1]:>18}")
+
+    service.read_markers.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Server CPU spent on idle StreamThreadMessages calls as the number of streams grows.
+
+For each stream count the server runs in this process and a child process opens
+that many streams on one thread and leaves them idle. The server's CPU time is
+then sampled over --window seconds. With event-driven delivery it should stay
+flat from 10 to 10,000 streams, where the old 1s polling loop grew with every stream.
+
+    python -m benchmarks.idle_streams
+    python -m benchmarks.idle_streams --mode sync --streams 10 100 1000
+"""
+
+from benchmarks import common
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+import grpc
+
+from messenger.generated import messaging_pb2, messaging_pb2_grpc
+from messenger.services.aio import AsyncMessagingService
+from messenger.services.handlers import add_messaging_service_to_server
+from messenger.services.messaging_service import MessagingService
+
+# streams per client connection, well under the server's per-connection stream limit
+STREAMS_PER_CONNECTION = 100
+
+def start_server(service, mode, streams):
+    # (port, stop) for a server bound to a free local port
+    if mode == "sync":
+        # thread-per-call, so every idle stream holds a worker
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=streams + 10))
+        add_messaging_service_to_server(service, server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        server.start()
+        return port, lambda: server.stop(0)
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="bench-aio-server", daemon=True)
+    thread.start()
+    executor = futures.ThreadPoolExecutor(max_workers=10)
+
+    async def start():
+        # grpc.aio servers belong to the loop they are created on
+        server = grpc.aio.server()
+        add_messaging_service_to_server(AsyncMessagingService(service, executor), server)
+        port = server.add_insecure_port("127.0.0.1:0")
+        await server.start()
+        return server, port
+    server, port = asyncio.run_coroutine_threadsafe(start(), loop).result()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(server.stop(0), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        executor.shutdown(wait=False)
+    return port, stop
+
+async def hold_streams(port, token, thread_id, streams):
+    # child process: opens streams, says "ready" once all are connected, holds them until stdin closes
+    channels = []
+    calls = []
+    for first in range(0, streams, STREAMS_PER_CONNECTION):
+        # a local subchannel pool gives each channel its own connection
+        channel = grpc.aio.insecure_channel(f"127.0.0.1:{port}", options=[("grpc.use_local_subchannel_pool", 1)])
+        stub = messaging_pb2_grpc.MessagingServiceStub(channel)
+        channel_calls = [
+            stub.StreamThreadMessages(messaging_pb2.StreamThreadMessagesRequest(token=token, thread_id=thread_id))
+            for _ in range(min(STREAMS_PER_CONNECTION, streams - first))
+        ]
+        for call in channel_calls:
+            response = await call.read()
+            assert response.status.connected, response
+        channels.append(channel)
+        calls.extend(channel_calls)
+
+    print("ready", flush=True)
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+    for call in calls:
+        call.cancel()
+    for channel in channels:
+        await channel.close()
+
+def measure(service, mode, token, thread_id, streams, window):
+    # server CPU seconds per second of wall time while streams sit idle
+    port, stop = start_server(service, mode, streams)
+    clients = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.idle_streams", "--hold", str(port), token, str(thread_id), str(streams)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    try:
+        if clients.stdout.readline().strip() != "ready":
+            raise RuntimeError("stream clients failed to connect")
+        # let connection setup settle before sampling
+        time.sleep(1)
+
+        # the client runs in another process, so this is the server's CPU alone
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        time.sleep(window)
+        cpu = time.process_time() - cpu_started
+        wall = time.perf_counter() - wall_started
+
+        subscribed = sum(len(subscriptions) for subscriptions in service.subscribers.values())
+    finally:
+        clients.stdin.close()
+        clients.wait()
+        stop()
+    return cpu / wall, subscribed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--mode", choices=["aio", "sync"], default="aio")
+    parser.add_argument("--window", type=float, default=5.0, help="seconds of idle time sampled per stream count")
+    parser.add_argument("--hold", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hold:
+        port, token, thread_id, streams = args.hold
+        asyncio.run(hold_streams(int(port), token, int(thread_id), int(streams)))
+        return
+
+    common.setup_database()
+    service = MessagingService()
+    (_, _, alice_token), (_, bob, _) = common.create_users(2)
+    thread = service.CreateThread(messaging_pb2.CreateThreadRequest(
+        token=alice_token,
+        participant_usernames=[bob],
+        name="idle streams"
+    ), common.Context()).thread
+
+    print(f"mode: {args.mode}, window: {args.window}s")
+    print(f"{'streams':>8}  {'server cpu':>12}")
+    for streams in args.streams:
+        cpu, subscribed = measure(service, args.mode, alice_token, thread.id, streams, args.window)
+        assert subscribed == streams, f"{subscribed} of {streams} streams subscribed"
+        print(f"{streams:>8}  {cpu * 100:>11.2f}%")
+
+    service.read_markers.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Sustained SendMessage writes per second, by write path or with write batching
+off and on.
+
+--mode paths (the default) runs one worker thread. "before" is the ORM write
+SendMessage used to do: add and flush the message, SELECT its thread, set the
+last-message columns through the ORM and commit. "after" is the current
+_insert_message, one statement on postgres and two elsewhere. Both run in their
+own transaction per message, commit included, and build the response proto. The
+participant check and sender name come from memory in both, so they are left out.
+
+--mode batching calls SendMessage from --senders threads at once, each a
+different participant of one group thread. "unbatched" is the default
+transaction per message, "batched" is what WRITE_BATCHING_ENABLED turns on,
+a WriteBatcher group-committing whatever arrives within WRITE_BATCH_WINDOW_MS.
+Latencies are per SendMessage call, and batch is the average batch written.
+
+    python -m benchmarks.send_message_throughput
+    DATABASE_URL=postgresql://... python -m benchmarks.send_message_throughput --seconds 10
+    DATABASE_URL=postgresql://... python -m benchmarks.send_message_throughput --mode batching --senders 500
+"""
+
+from benchmarks import common
+
+import argparse
+import threading
+import time
+from datetime import datetime, UTC
+from sqlalchemy import event
+
+from messenger.config.database import engine, session_scope
+from messenger.generated import messaging_pb2
+from messenger.models import Message, Thread
+from messenger.services.messaging_service import MessagingService
+from messenger.services.write_batcher import WriteBatcher
+from messenger.utils.timestamps import utc_now
+
+def write_before(service, thread_id, sender_id, sender_username, content):
+    with session_scope() as db:
+        new_message = Message(content=content, sender_id=sender_id, thread_id=thread_id, created_at=datetime.now(UTC))
+        db.add(new_message)
+        db.flush()
+
+        thread = db.query(Thread).filter(Thread.id == thread_id).first()
+        if thread:
+            thread.set_last_message(new_message, sender_username)
+
+        message_proto = service._message_to_proto(new_message, sender_username)
+        db.commit()
+    return message_proto
+
+def write_after(service, thread_id, sender_id, sender_username, content):
+    new_message = Message(content=content, sender_id=sender_id, thread_id=thread_id, created_at=utc_now())
+    with session_scope() as db:
+        new_message.id = service._insert_message(db, new_message, sender_username)
+        db.commit()
+    return service._message_to_proto(new_message, sender_username)
+
+def run(write, service, thread_id, sender_id, sender_username, seconds):
+    # (messages per second, statements per message)
+    statements = []
+    def count(*args):
+        statements.append(1)
+
+    sent = 0
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        while time.perf_counter() < deadline:
+            write(service, thread_id, sender_id, sender_username, f"message {sent}")
+            sent += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return sent / elapsed, len(statements) / sent
+
+def run_senders(service, tokens, thread_id, seconds):
+    # (messages per second, p50 seconds, p99 seconds, failed sends) with one thread per token
+    latencies = []
+    failed = []
+    start = threading.Barrier(len(tokens) + 1)
+
+    def send(token):
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = service.SendMessage(messaging_pb2.SendMessageRequest(
+                token=token,
+                thread_id=thread_id,
+                content=f"message {len(latencies)}"
+            ), common.Context())
+            (latencies if response.success else failed).append(time.perf_counter() - started)
+
+    senders = [threading.Thread(target=send, args=(token,)) for token in tokens]
+    for sender in senders:
+        sender.start()
+    start.wait()
+    started = time.perf_counter()
+    for sender in senders:
+        sender.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] if latencies else 0.0
+    return len(latencies) / elapsed, percentile(0.5), percentile(0.99), len(failed)
+
+def compare_batching(service, senders, seconds, runs):
+    users = common.create_users(senders)
+    creator_token = users[0][2]
+    thread = service.CreateThread(messaging_pb2.CreateThreadRequest(
+        token=creator_token,
+        participant_usernames=[username for _, username, _ in users[1:]],
+        name="throughput"
+    ), common.Context()).thread
+    tokens = [token for _, _, token in users]
+
+    batches = []
+    def write(rows):
+        batches.append(len(rows))
+        return service._commit_messages(rows)
+    batcher = WriteBatcher(write)
+
+    results = {"unbatched": [], "batched": []}
+    for _ in range(runs):
+        for label, write_batcher in (("unbatched", None), ("batched", batcher)):
+            service.write_batcher = write_batcher
+            batches.clear()
+            rate, p50, p99, failed = run_senders(service, tokens, thread.id, seconds)
+            batch = sum(batches) / len(batches) if batches else 1.0
+            results[label].append((rate, p50, p99, failed, batch))
+    service.write_batcher = None
+
+    print(f"senders: {senders}")
+    print(f"{'mode':>9}  {'msg/s (min-max)':>16}  {'p50':>8}  {'p99':>8}  {'failed':>6}  {'batch':>5}")
+    for label, runs in results.items():
+        rates = [rate for rate, *_ in runs]
+        # latencies and batch size from the median-rate run
+        _, p50, p99, _, batch = sorted(runs)[len(runs) // 2]
+        failed = sum(failed for _, _, _, failed, _ in runs)
+        print(f"{label:>9}  {min(rates):>7.0f}-{max(rates):<8.0f}  {p50 * 1000:>6.0f}ms  {p99 * 1000:>6.0f}ms  {failed:>6}  {batch:>5.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mode", choices=["paths", "batching"], default="paths")
+    parser.add_argument("--seconds", type=float, default=3.0, help="length of each run")
+    parser.add_argument("--runs", type=int, default=3, help="runs per write path or batching mode, alternating")
+    parser.add_argument("--senders", type=int, default=500, help="concurrent senders in --mode batching")
+    args = parser.parse_args()
+
+    common.setup_database()
+    service = MessagingService()
+    if args.mode == "batching":
+        compare_batching(service, args.senders, args.seconds, args.runs)
+        service.read_markers.stop()
+        return
+
+    (alice_id, alice, alice_token), (_, bob, _) = common.create_users(2)
+    thread = service.CreateThread(messaging_pb2.CreateThreadRequest(
+        token=alice_token,
+        participant_usernames=[bob],
+        name="throughput"
+    ), common.Context()).thread
+
+    results = {"before": [], "after": []}
+    for _ in range(args.runs):
+        for label, write in (("before", write_before), ("after", write_after)):
+            results[label].append(run(write, service, thread.id, alice_id, alice, args.seconds))
+
+    print(f"{'path':>6}  {'msg/s (min-max)':>16}  {'statements/msg':>14}")
+    for label, runs in results.items():
+        rates = [rate for rate, _ in runs]
+        print(f"{label:>6}  {min(rates):>7.0f}-{max(rates):<8.0f}  {runs[0][1]:>14.1f}")
+
+    service.read_markers.stop()
+
+if __name__ == "__main__":
+    main()
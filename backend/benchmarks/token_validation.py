@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+validate_jwt_token calls per second with and without the decoded-token cache.
+
+A chatty client sends the same access token with every call, so each run
+validates one token over and over on a single thread. "uncached" sets
+TOKEN_CACHE_SIZE to 0, which runs the full jwt.decode every time.
+
+    python -m benchmarks.token_validation
+    python -m benchmarks.token_validation --calls 500000
+"""
+
+from benchmarks import common
+
+import argparse
+import time
+
+from messenger.utils import auth
+
+def validations_per_second(token, calls):
+    context = common.Context()
+    started = time.perf_counter()
+    for _ in range(calls):
+        assert auth.validate_jwt_token(token, context) is not None
+    return calls / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100000)
+    args = parser.parse_args()
+
+    token, _, _ = auth.issue_tokens(1, "bench")
+    cache_size = auth.TOKEN_CACHE_SIZE or 10000
+
+    print(f"{'cache':>8}  {'validations/s':>14}")
+    for label, size in (("uncached", 0), ("cached", cache_size)):
+        auth.TOKEN_CACHE_SIZE = size
+        print(f"{label:>8}  {validations_per_second(token, args.calls):>14,.0f}")
+
+if __name__ == "__main__":
+    main()
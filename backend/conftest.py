@@ -0,0 +1,133 @@
+"""
+Shared pytest setup.
+Tests run MessagingService directly against a throwaway SQLite database, no server needed.
+"""
+
+import os
+import tempfile
+
+# must be set before messenger.config.database creates the engine
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "messenger_test.db")
+
+import itertools
+import time
+import jwt
+import pytest
+from sqlalchemy import event
+from messenger.config.database import engine, get_db_session, init_db
+from messenger.generated import messaging_pb2
+from messenger.models import User
+from messenger.services.messaging_service import MessagingService
+from messenger.utils.auth import JWT_SECRET, JWT_ALGORITHM
+
+class FakeContext:
+    def __init__(self):
+        self.code = None
+        self.details = None
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+class Aborted(Exception):
+    pass
+
+class StreamContext(FakeContext):
+    # FakeContext for streaming calls. add_callback refuses callbacks once the call
+    # has ended, like the sync server does, and abort raises as it does there
+    def __init__(self, active=True):
+        super().__init__()
+        self.active = active
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        if not self.active:
+            return False
+        self.callbacks.append(callback)
+        return True
+
+    def cancel(self):
+        # the client going away
+        self.active = False
+        for callback in self.callbacks:
+            callback()
+
+    def abort(self, code, details):
+        self.code = code
+        self.details = details
+        raise Aborted(details)
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+class Messenger:
+    # one MessagingService for the whole run, tests keep apart by using their own users
+    def __init__(self):
+        init_db()
+        self.service = MessagingService()
+        self._user_numbers = itertools.count()
+
+    def create_users(self, *names):
+        # users named <name>_<n>, returns {name: (user_id, username, token)}
+        number = next(self._user_numbers)
+        db = get_db_session()
+        users = [User(username=f"{name}_{number}", password_hash="x") for name in names]
+        db.add_all(users)
+        db.commit()
+        created = {
+            name: (user.id, user.username, self.token(user.id, user.username))
+            for name, user in zip(names, users)
+        }
+        db.close()
+        return created
+
+    def token(self, user_id, username):
+        return jwt.encode(
+            {"user_id": user_id, "username": username, "exp": int(time.time()) + 3600},
+            JWT_SECRET,
+            algorithm=JWT_ALGORITHM
+        )
+
+    def create_thread(self, token, participant_usernames, name):
+        response = self.service.CreateThread(messaging_pb2.CreateThreadRequest(
+            token=token,
+            participant_usernames=participant_usernames,
+            name=name
+        ), FakeContext())
+        assert response.success, response.message
+        return response.thread
+
+    def send_message(self, token, thread_id, content):
+        response = self.service.SendMessage(messaging_pb2.SendMessageRequest(
+            token=token,
+            thread_id=thread_id,
+            content=content
+        ), FakeContext())
+        assert response.success, response.message
+        return response.sent_message
+
+@pytest.fixture
+def non_utc_timezone(monkeypatch):
+    # runs the test with the process in a zone that is hours off UTC
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+@pytest.fixture(scope="session")
+def messenger():
+    return Messenger()
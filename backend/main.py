@@ -1,37 +1,59 @@
+import asyncio
 import logging
+import os
+import threading
 from concurrent import futures
 import grpc
 from grpc_reflection.v1alpha import reflection
 
-from messenger.generated import auth_pb2, auth_pb2_grpc, messaging_pb2, messaging_pb2_grpc
+from messenger.generated import auth_pb2, auth_pb2_grpc, messaging_pb2
 
 from messenger.services.auth_service import AuthService
 from messenger.services.messaging_service import MessagingService
+from messenger.services.aio import AsyncAuthService, AsyncMessagingService
+from messenger.services.broadcast import create_bus
+from messenger.services.handlers import add_messaging_service_to_server
+from messenger.services.interceptors import AsyncAuthInterceptor, AuthInterceptor
+from messenger.utils.metrics import metrics
+from messenger.utils.passwords import password_checker
+
+# "aio" serves on grpc.aio so open streams don't hold worker threads,
+# "sync" is the original thread-per-call server kept as a fallback
+SERVER_MODE = os.getenv("SERVER_MODE", "aio")
+MAX_WORKERS = int(os.getenv("GRPC_MAX_WORKERS", "10"))
+LISTEN_ADDR = f"[::]:{os.getenv('BACKEND_PORT', '50051')}"
+METRICS_LOG_INTERVAL_SECONDS = int(os.getenv("METRICS_LOG_INTERVAL_SECONDS", "60"))
+
+# reflection so I can grpcurl
+SERVICE_NAMES = (
+    auth_pb2.DESCRIPTOR.services_by_name['AuthService'].full_name,
+    messaging_pb2.DESCRIPTOR.services_by_name['MessagingService'].full_name,
+    reflection.SERVICE_NAME,
+)
+
+def log_metrics():
+    stopped = threading.Event()
+    while not stopped.wait(METRICS_LOG_INTERVAL_SECONDS):
+        logging.info(f"Metrics: {metrics.snapshot()}")
+
+def start_metrics_logger():
+    if METRICS_LOG_INTERVAL_SECONDS > 0:
+        threading.Thread(target=log_metrics, name="metrics-logger", daemon=True).start()
 
 def serve():
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=MAX_WORKERS), interceptors=(AuthInterceptor(),))
     
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    messaging_service = MessagingService(bus=create_bus())
+    messaging_service.users.warm()
     
     auth_pb2_grpc.add_AuthServiceServicer_to_server(AuthService(), server)
-    messaging_pb2_grpc.add_MessagingServiceServicer_to_server(MessagingService(), server)
+    add_messaging_service_to_server(messaging_service, server)
     
-    # reflection so I can grpcurl
-    SERVICE_NAMES = (
-        auth_pb2.DESCRIPTOR.services_by_name['AuthService'].full_name,
-        messaging_pb2.DESCRIPTOR.services_by_name['MessagingService'].full_name,
-        reflection.SERVICE_NAME,
-    )
     reflection.enable_server_reflection(SERVICE_NAMES, server)
     
-    listen_addr = '[::]:50051'
-    server.add_insecure_port(listen_addr)
+    server.add_insecure_port(LISTEN_ADDR)
     
-    logging.info(f"Starting Messenger gRPC Server on {listen_addr}")
+    logging.info(f"Starting Messenger gRPC Server on {LISTEN_ADDR} (sync, {MAX_WORKERS} workers)")
     logging.info("gRPC reflection enabled")
     logging.info("Authentication and messaging services ready")
     server.start()
@@ -41,9 +63,56 @@ def serve():
     except KeyboardInterrupt:
         logging.info("\nShutting down server...")
         server.stop(0)
+        messaging_service.read_markers.stop()
+        password_checker.shutdown()
+
+async def serve_aio():
+    # unary handlers share the sync implementation and run on this pool,
+    # streams are coroutines and never occupy it while idle
+    executor = futures.ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    server = grpc.aio.server(interceptors=(AsyncAuthInterceptor(),))
+    
+    messaging_service = MessagingService(bus=create_bus())
+    messaging_service.users.warm()
+    
+    auth_pb2_grpc.add_AuthServiceServicer_to_server(AsyncAuthService(AuthService(), executor), server)
+    add_messaging_service_to_server(AsyncMessagingService(messaging_service, executor), server)
+    
+    reflection.enable_server_reflection(SERVICE_NAMES, server)
+    
+    server.add_insecure_port(LISTEN_ADDR)
+    
+    logging.info(f"Starting Messenger gRPC Server on {LISTEN_ADDR} (aio, {MAX_WORKERS} executor workers)")
+    logging.info("gRPC reflection enabled")
+    logging.info("Authentication and messaging services ready")
+    await server.start()
+    
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+        executor.shutdown(wait=False)
+        messaging_service.read_markers.stop()
+        password_checker.shutdown()
 
 def main():
-    serve()
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
+    start_metrics_logger()
+    password_checker.start()
+    
+    if SERVER_MODE == "sync":
+        serve()
+        return
+    
+    try:
+        asyncio.run(serve_aio())
+    except KeyboardInterrupt:
+        logging.info("\nShutting down server...")
 
 if __name__ == "__main__":
     main()
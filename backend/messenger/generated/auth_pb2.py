@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nauth.proto\x12\tmessenger\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"c\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05token\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x0f\n\x07user_id\x18\x04 \x01(\x05\x12\x10\n\x08username\x18\x05 \x01(\t\"%\n\x14ValidateTokenRequest\x12\r\n\x05token\x18\x01 \x01(\t\"I\n\x15ValidateTokenResponse\x12\r\n\x05valid\x18\x01 \x01(\x08\x12\x0f\n\x07user_id\x18\x02 \x01(\x05\x12\x10\n\x08username\x18\x03 \x01(\t2\x9d\x01\n\x0b\x41uthService\x12:\n\x05Login\x12\x17.messenger.LoginRequest\x1a\x18.messenger.LoginResponse\x12R\n\rValidateToken\x12\x1f.messenger.ValidateTokenRequest\x1a .messenger.ValidateTokenResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\nauth.proto\x12\tmessenger\"2\n\x0cLoginRequest\x12\x10\n\x08username\x18\x01 \x01(\t\x12\x10\n\x08password\x18\x02 \x01(\t\"\x8e\x01\n\rLoginResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05token\x18\x02 \x01(\t\x12\x0f\n\x07message\x18\x03 \x01(\t\x12\x0f\n\x07user_id\x18\x04 \x01(\x05\x12\x10\n\x08username\x18\x05 \x01(\t\x12\x15\n\rrefresh_token\x18\x06 \x01(\t\x12\x12\n\nexpires_in\x18\x07 \x01(\x05\"%\n\x14ValidateTokenRequest\x12\r\n\x05token\x18\x01 \x01(\t\"I\n\x15ValidateTokenResponse\x12\r\n\x05valid\x18\x01 \x01(\x08\x12\x0f\n\x07user_id\x18\x02 \x01(\x05\x12\x10\n\x08username\x18\x03 \x01(\t\",\n\x13RefreshTokenRequest\x12\x15\n\rrefresh_token\x18\x01 \x01(\t\"\x95\x01\n\x14RefreshTokenResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\r\n\x05token\x18\x02 \x01(\t\x12\x15\n\rrefresh_token\x18\x03 \x01(\t\x12\x0f\n\x07message\x18\x04 \x01(\t\x12\x0f\n\x07user_id\x18\x05 \x01(\x05\x12\x10\n\x08username\x18\x06 \x01(\t\x12\x12\n\nexpires_in\x18\x07 \x01(\x05\x32\xee\x01\n\x0b\x41uthService\x12:\n\x05Login\x12\x17.messenger.LoginRequest\x1a\x18.messenger.LoginResponse\x12R\n\rValidateToken\x12\x1f.messenger.ValidateTokenRequest\x1a .messenger.ValidateTokenResponse\x12O\n\x0cRefreshToken\x12\x1e.messenger.RefreshTokenRequest\x1a\x1f.messenger.RefreshTokenResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -33,12 +33,16 @@ if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
   _globals['_LOGINREQUEST']._serialized_start=25
   _globals['_LOGINREQUEST']._serialized_end=75
-  _globals['_LOGINRESPONSE']._serialized_start=77
-  _globals['_LOGINRESPONSE']._serialized_end=176
-  _globals['_VALIDATETOKENREQUEST']._serialized_start=178
-  _globals['_VALIDATETOKENREQUEST']._serialized_end=215
-  _globals['_VALIDATETOKENRESPONSE']._serialized_start=217
-  _globals['_VALIDATETOKENRESPONSE']._serialized_end=290
-  _globals['_AUTHSERVICE']._serialized_start=293
-  _globals['_AUTHSERVICE']._serialized_end=450
+  _globals['_LOGINRESPONSE']._serialized_start=78
+  _globals['_LOGINRESPONSE']._serialized_end=220
+  _globals['_VALIDATETOKENREQUEST']._serialized_start=222
+  _globals['_VALIDATETOKENREQUEST']._serialized_end=259
+  _globals['_VALIDATETOKENRESPONSE']._serialized_start=261
+  _globals['_VALIDATETOKENRESPONSE']._serialized_end=334
+  _globals['_REFRESHTOKENREQUEST']._serialized_start=336
+  _globals['_REFRESHTOKENREQUEST']._serialized_end=380
+  _globals['_REFRESHTOKENRESPONSE']._serialized_start=383
+  _globals['_REFRESHTOKENRESPONSE']._serialized_end=532
+  _globals['_AUTHSERVICE']._serialized_start=535
+  _globals['_AUTHSERVICE']._serialized_end=773
 # @@protoc_insertion_point(module_scope)
@@ -44,6 +44,11 @@ class AuthServiceStub(object):
                 request_serializer=auth__pb2.ValidateTokenRequest.SerializeToString,
                 response_deserializer=auth__pb2.ValidateTokenResponse.FromString,
                 _registered_method=True)
+        self.RefreshToken = channel.unary_unary(
+                '/messenger.AuthService/RefreshToken',
+                request_serializer=auth__pb2.RefreshTokenRequest.SerializeToString,
+                response_deserializer=auth__pb2.RefreshTokenResponse.FromString,
+                _registered_method=True)
 
 
 class AuthServiceServicer(object):
@@ -61,6 +66,12 @@ class AuthServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def RefreshToken(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_AuthServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -74,6 +85,11 @@ def add_AuthServiceServicer_to_server(servicer, server):
                     request_deserializer=auth__pb2.ValidateTokenRequest.FromString,
                     response_serializer=auth__pb2.ValidateTokenResponse.SerializeToString,
             ),
+            'RefreshToken': grpc.unary_unary_rpc_method_handler(
+                    servicer.RefreshToken,
+                    request_deserializer=auth__pb2.RefreshTokenRequest.FromString,
+                    response_serializer=auth__pb2.RefreshTokenResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'messenger.AuthService', rpc_method_handlers)
@@ -138,3 +154,30 @@ class AuthService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def RefreshToken(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.AuthService/RefreshToken',
+            auth__pb2.RefreshTokenRequest.SerializeToString,
+            auth__pb2.RefreshTokenResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fmessaging.proto\x12\tmessenger\"$\n\x04User\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\"f\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\t\x12\x11\n\tsender_id\x18\x03 \x01(\x05\x12\x17\n\x0fsender_username\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\x03\"\x87\x01\n\x06Thread\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12%\n\x0cparticipants\x18\x03 \x03(\x0b\x32\x0f.messenger.User\x12(\n\x0clast_message\x18\x04 \x01(\x0b\x32\x12.messenger.Message\x12\x12\n\nupdated_at\x18\x05 \x01(\x03\"\"\n\x11GetThreadsRequest\x12\r\n\x05token\x18\x01 \x01(\t\"8\n\x12GetThreadsResponse\x12\"\n\x07threads\x18\x01 \x03(\x0b\x32\x11.messenger.Thread\"U\n\x12GetMessagesRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\r\n\x05limit\x18\x03 \x01(\x05\x12\x0e\n\x06offset\x18\x04 \x01(\x05\";\n\x13GetMessagesResponse\x12$\n\x08messages\x18\x01 \x03(\x0b\x32\x12.messenger.Message\"G\n\x12SendMessageRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"a\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12(\n\x0csent_message\x18\x03 \x01(\x0b\x32\x12.messenger.Message\"Q\n\x13\x43reateThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x1d\n\x15participant_usernames\x18\x02 \x03(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\"[\n\x14\x43reateThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12!\n\x06thread\x18\x03 \x01(\x0b\x32\x11.messenger.Thread\"5\n\x11JoinThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\"6\n\x12JoinThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"6\n\x12LeaveThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\"7\n\x13LeaveThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"?\n\x1bStreamThreadMessagesRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\"\x8e\x01\n\x15MessageStreamResponse\x12)\n\x0bnew_message\x18\x01 \x01(\x0b\x32\x12.messenger.MessageH\x00\x12\x0f\n\x05\x65rror\x18\x02 \x01(\tH\x00\x12-\n\x06status\x18\x03 \x01(\x0b\x32\x1b.messenger.ConnectionStatusH\x00\x42\n\n\x08response\"6\n\x10\x43onnectionStatus\x12\x11\n\tconnected\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t2\xc7\x04\n\x10MessagingService\x12I\n\nGetThreads\x12\x1c.messenger.GetThreadsRequest\x1a\x1d.messenger.GetThreadsResponse\x12L\n\x0bGetMessages\x12\x1d.messenger.GetMessagesRequest\x1a\x1e.messenger.GetMessagesResponse\x12L\n\x0bSendMessage\x12\x1d.messenger.SendMessageRequest\x1a\x1e.messenger.SendMessageResponse\x12O\n\x0c\x43reateThread\x12\x1e.messenger.CreateThreadRequest\x1a\x1f.messenger.CreateThreadResponse\x12I\n\nJoinThread\x12\x1c.messenger.JoinThreadRequest\x1a\x1d.messenger.JoinThreadResponse\x12L\n\x0bLeaveThread\x12\x1d.messenger.LeaveThreadRequest\x1a\x1e.messenger.LeaveThreadResponse\x12\x62\n\x14StreamThreadMessages\x12&.messenger.StreamThreadMessagesRequest\x1a .messenger.MessageStreamResponse0\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0fmessaging.proto\x12\tmessenger\"$\n\x04User\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x10\n\x08username\x18\x02 \x01(\t\"y\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x02 \x01(\t\x12\x11\n\tsender_id\x18\x03 \x01(\x05\x12\x17\n\x0fsender_username\x18\x04 \x01(\t\x12\x12\n\ncreated_at\x18\x05 \x01(\x03\x12\x11\n\tthread_id\x18\x06 \x01(\x05\"\xbb\x01\n\x06Thread\x12\n\n\x02id\x18\x01 \x01(\x05\x12\x0c\n\x04name\x18\x02 \x01(\t\x12%\n\x0cparticipants\x18\x03 \x03(\x0b\x32\x0f.messenger.User\x12(\n\x0clast_message\x18\x04 \x01(\x0b\x32\x12.messenger.Message\x12\x12\n\nupdated_at\x18\x05 \x01(\x03\x12\x14\n\x0cunread_count\x18\x06 \x01(\x05\x12\x1c\n\x14last_read_message_id\x18\x07 \x01(\x05\"\"\n\x11GetThreadsRequest\x12\r\n\x05token\x18\x01 \x01(\t\"8\n\x12GetThreadsResponse\x12\"\n\x07threads\x18\x01 \x03(\x0b\x32\x11.messenger.Thread\"z\n\x12GetMessagesRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\r\n\x05limit\x18\x03 \x01(\x05\x12\x0e\n\x06offset\x18\x04 \x01(\x05\x12\x11\n\tbefore_id\x18\x05 \x01(\x05\x12\x10\n\x08\x61\x66ter_id\x18\x06 \x01(\x05\"P\n\x13GetMessagesResponse\x12$\n\x08messages\x18\x01 \x03(\x0b\x32\x12.messenger.Message\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\x05\"g\n\x15SearchMessagesRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\r\n\x05query\x18\x02 \x01(\t\x12\x11\n\tthread_id\x18\x03 \x01(\x05\x12\r\n\x05limit\x18\x04 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x05 \x01(\t\"Q\n\x16SearchMessagesResponse\x12\"\n\x04hits\x18\x01 \x03(\x0b\x32\x14.messenger.SearchHit\x12\x13\n\x0bnext_cursor\x18\x02 \x01(\t\"A\n\tSearchHit\x12#\n\x07message\x18\x01 \x01(\x0b\x32\x12.messenger.Message\x12\x0f\n\x07snippet\x18\x02 \x01(\t\"G\n\x12SendMessageRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\x0f\n\x07\x63ontent\x18\x03 \x01(\t\"a\n\x13SendMessageResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12(\n\x0csent_message\x18\x03 \x01(\x0b\x32\x12.messenger.Message\"h\n\x14SendMessagesResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12.\n\x07results\x18\x03 \x03(\x0b\x32\x1d.messenger.SendMessagesResult\"7\n\x12SendMessagesResult\x12\x12\n\nmessage_id\x18\x01 \x01(\x05\x12\r\n\x05\x65rror\x18\x02 \x01(\t\"Q\n\x13\x43reateThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x1d\n\x15participant_usernames\x18\x02 \x03(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\"[\n\x14\x43reateThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\x12!\n\x06thread\x18\x03 \x01(\x0b\x32\x11.messenger.Thread\"5\n\x11JoinThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\"6\n\x12JoinThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"G\n\x0fMarkReadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\x12\n\nmessage_id\x18\x03 \x01(\x05\"4\n\x10MarkReadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"6\n\x12LeaveThreadRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\"7\n\x13LeaveThreadResponse\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"]\n\x1bStreamThreadMessagesRequest\x12\r\n\x05token\x18\x01 \x01(\t\x12\x11\n\tthread_id\x18\x02 \x01(\x05\x12\x1c\n\x14last_seen_message_id\x18\x03 \x01(\x05\"\xbb\x01\n\x15MessageStreamResponse\x12)\n\x0bnew_message\x18\x01 \x01(\x0b\x32\x12.messenger.MessageH\x00\x12\x0f\n\x05\x65rror\x18\x02 \x01(\tH\x00\x12-\n\x06status\x18\x03 \x01(\x0b\x32\x1b.messenger.ConnectionStatusH\x00\x12+\n\x06missed\x18\x04 \x01(\x0b\x32\x19.messenger.MissedMessagesH\x00\x42\n\n\x08response\"\x1f\n\x0eMissedMessages\x12\r\n\x05\x63ount\x18\x01 \x01(\x05\"(\n\x17StreamUserEventsRequest\x12\r\n\x05token\x18\x01 \x01(\t\"\x86\x02\n\tUserEvent\x12)\n\x0bnew_message\x18\x01 \x01(\x0b\x32\x12.messenger.MessageH\x00\x12+\n\x0ethread_created\x18\x02 \x01(\x0b\x32\x11.messenger.ThreadH\x00\x12+\n\x0ethread_updated\x18\x03 \x01(\x0b\x32\x11.messenger.ThreadH\x00\x12\x0f\n\x05\x65rror\x18\x04 \x01(\tH\x00\x12-\n\x06status\x18\x05 \x01(\x0b\x32\x1b.messenger.ConnectionStatusH\x00\x12+\n\x06missed\x18\x06 \x01(\x0b\x32\x19.messenger.MissedMessagesH\x00\x42\x07\n\x05\x65vent\"6\n\x10\x43onnectionStatus\x12\x11\n\tconnected\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t2\x85\x07\n\x10MessagingService\x12I\n\nGetThreads\x12\x1c.messenger.GetThreadsRequest\x1a\x1d.messenger.GetThreadsResponse\x12L\n\x0bGetMessages\x12\x1d.messenger.GetMessagesRequest\x1a\x1e.messenger.GetMessagesResponse\x12U\n\x0eSearchMessages\x12 .messenger.SearchMessagesRequest\x1a!.messenger.SearchMessagesResponse\x12L\n\x0bSendMessage\x12\x1d.messenger.SendMessageRequest\x1a\x1e.messenger.SendMessageResponse\x12P\n\x0cSendMessages\x12\x1d.messenger.SendMessageRequest\x1a\x1f.messenger.SendMessagesResponse(\x01\x12O\n\x0c\x43reateThread\x12\x1e.messenger.CreateThreadRequest\x1a\x1f.messenger.CreateThreadResponse\x12I\n\nJoinThread\x12\x1c.messenger.JoinThreadRequest\x1a\x1d.messenger.JoinThreadResponse\x12\x43\n\x08MarkRead\x12\x1a.messenger.MarkReadRequest\x1a\x1b.messenger.MarkReadResponse\x12L\n\x0bLeaveThread\x12\x1d.messenger.LeaveThreadRequest\x1a\x1e.messenger.LeaveThreadResponse\x12\x62\n\x14StreamThreadMessages\x12&.messenger.StreamThreadMessagesRequest\x1a .messenger.MessageStreamResponse0\x01\x12N\n\x10StreamUserEvents\x12\".messenger.StreamUserEventsRequest\x1a\x14.messenger.UserEvent0\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,39 +34,59 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_USER']._serialized_start=30
   _globals['_USER']._serialized_end=66
   _globals['_MESSAGE']._serialized_start=68
-  _globals['_MESSAGE']._serialized_end=170
-  _globals['_THREAD']._serialized_start=173
-  _globals['_THREAD']._serialized_end=308
-  _globals['_GETTHREADSREQUEST']._serialized_start=310
-  _globals['_GETTHREADSREQUEST']._serialized_end=344
-  _globals['_GETTHREADSRESPONSE']._serialized_start=346
-  _globals['_GETTHREADSRESPONSE']._serialized_end=402
-  _globals['_GETMESSAGESREQUEST']._serialized_start=404
-  _globals['_GETMESSAGESREQUEST']._serialized_end=489
-  _globals['_GETMESSAGESRESPONSE']._serialized_start=491
-  _globals['_GETMESSAGESRESPONSE']._serialized_end=550
-  _globals['_SENDMESSAGEREQUEST']._serialized_start=552
-  _globals['_SENDMESSAGEREQUEST']._serialized_end=623
-  _globals['_SENDMESSAGERESPONSE']._serialized_start=625
-  _globals['_SENDMESSAGERESPONSE']._serialized_end=722
-  _globals['_CREATETHREADREQUEST']._serialized_start=724
-  _globals['_CREATETHREADREQUEST']._serialized_end=805
-  _globals['_CREATETHREADRESPONSE']._serialized_start=807
-  _globals['_CREATETHREADRESPONSE']._serialized_end=898
-  _globals['_JOINTHREADREQUEST']._serialized_start=900
-  _globals['_JOINTHREADREQUEST']._serialized_end=953
-  _globals['_JOINTHREADRESPONSE']._serialized_start=955
-  _globals['_JOINTHREADRESPONSE']._serialized_end=1009
-  _globals['_LEAVETHREADREQUEST']._serialized_start=1011
-  _globals['_LEAVETHREADREQUEST']._serialized_end=1065
-  _globals['_LEAVETHREADRESPONSE']._serialized_start=1067
-  _globals['_LEAVETHREADRESPONSE']._serialized_end=1122
-  _globals['_STREAMTHREADMESSAGESREQUEST']._serialized_start=1124
-  _globals['_STREAMTHREADMESSAGESREQUEST']._serialized_end=1187
-  _globals['_MESSAGESTREAMRESPONSE']._serialized_start=1190
-  _globals['_MESSAGESTREAMRESPONSE']._serialized_end=1332
-  _globals['_CONNECTIONSTATUS']._serialized_start=1334
-  _globals['_CONNECTIONSTATUS']._serialized_end=1388
-  _globals['_MESSAGINGSERVICE']._serialized_start=1391
-  _globals['_MESSAGINGSERVICE']._serialized_end=1974
+  _globals['_MESSAGE']._serialized_end=189
+  _globals['_THREAD']._serialized_start=192
+  _globals['_THREAD']._serialized_end=379
+  _globals['_GETTHREADSREQUEST']._serialized_start=381
+  _globals['_GETTHREADSREQUEST']._serialized_end=415
+  _globals['_GETTHREADSRESPONSE']._serialized_start=417
+  _globals['_GETTHREADSRESPONSE']._serialized_end=473
+  _globals['_GETMESSAGESREQUEST']._serialized_start=475
+  _globals['_GETMESSAGESREQUEST']._serialized_end=597
+  _globals['_GETMESSAGESRESPONSE']._serialized_start=599
+  _globals['_GETMESSAGESRESPONSE']._serialized_end=679
+  _globals['_SEARCHMESSAGESREQUEST']._serialized_start=681
+  _globals['_SEARCHMESSAGESREQUEST']._serialized_end=784
+  _globals['_SEARCHMESSAGESRESPONSE']._serialized_start=786
+  _globals['_SEARCHMESSAGESRESPONSE']._serialized_end=867
+  _globals['_SEARCHHIT']._serialized_start=869
+  _globals['_SEARCHHIT']._serialized_end=934
+  _globals['_SENDMESSAGEREQUEST']._serialized_start=936
+  _globals['_SENDMESSAGEREQUEST']._serialized_end=1007
+  _globals['_SENDMESSAGERESPONSE']._serialized_start=1009
+  _globals['_SENDMESSAGERESPONSE']._serialized_end=1106
+  _globals['_SENDMESSAGESRESPONSE']._serialized_start=1108
+  _globals['_SENDMESSAGESRESPONSE']._serialized_end=1212
+  _globals['_SENDMESSAGESRESULT']._serialized_start=1214
+  _globals['_SENDMESSAGESRESULT']._serialized_end=1269
+  _globals['_CREATETHREADREQUEST']._serialized_start=1271
+  _globals['_CREATETHREADREQUEST']._serialized_end=1352
+  _globals['_CREATETHREADRESPONSE']._serialized_start=1354
+  _globals['_CREATETHREADRESPONSE']._serialized_end=1445
+  _globals['_JOINTHREADREQUEST']._serialized_start=1447
+  _globals['_JOINTHREADREQUEST']._serialized_end=1500
+  _globals['_JOINTHREADRESPONSE']._serialized_start=1502
+  _globals['_JOINTHREADRESPONSE']._serialized_end=1556
+  _globals['_MARKREADREQUEST']._serialized_start=1558
+  _globals['_MARKREADREQUEST']._serialized_end=1629
+  _globals['_MARKREADRESPONSE']._serialized_start=1631
+  _globals['_MARKREADRESPONSE']._serialized_end=1683
+  _globals['_LEAVETHREADREQUEST']._serialized_start=1685
+  _globals['_LEAVETHREADREQUEST']._serialized_end=1739
+  _globals['_LEAVETHREADRESPONSE']._serialized_start=1741
+  _globals['_LEAVETHREADRESPONSE']._serialized_end=1796
+  _globals['_STREAMTHREADMESSAGESREQUEST']._serialized_start=1798
+  _globals['_STREAMTHREADMESSAGESREQUEST']._serialized_end=1891
+  _globals['_MESSAGESTREAMRESPONSE']._serialized_start=1894
+  _globals['_MESSAGESTREAMRESPONSE']._serialized_end=2081
+  _globals['_MISSEDMESSAGES']._serialized_start=2083
+  _globals['_MISSEDMESSAGES']._serialized_end=2114
+  _globals['_STREAMUSEREVENTSREQUEST']._serialized_start=2116
+  _globals['_STREAMUSEREVENTSREQUEST']._serialized_end=2156
+  _globals['_USEREVENT']._serialized_start=2159
+  _globals['_USEREVENT']._serialized_end=2421
+  _globals['_CONNECTIONSTATUS']._serialized_start=2423
+  _globals['_CONNECTIONSTATUS']._serialized_end=2477
+  _globals['_MESSAGINGSERVICE']._serialized_start=2480
+  _globals['_MESSAGINGSERVICE']._serialized_end=3381
 # @@protoc_insertion_point(module_scope)
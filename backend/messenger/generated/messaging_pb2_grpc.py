@@ -44,11 +44,21 @@ class MessagingServiceStub(object):
                 request_serializer=messaging__pb2.GetMessagesRequest.SerializeToString,
                 response_deserializer=messaging__pb2.GetMessagesResponse.FromString,
                 _registered_method=True)
+        self.SearchMessages = channel.unary_unary(
+                '/messenger.MessagingService/SearchMessages',
+                request_serializer=messaging__pb2.SearchMessagesRequest.SerializeToString,
+                response_deserializer=messaging__pb2.SearchMessagesResponse.FromString,
+                _registered_method=True)
         self.SendMessage = channel.unary_unary(
                 '/messenger.MessagingService/SendMessage',
                 request_serializer=messaging__pb2.SendMessageRequest.SerializeToString,
                 response_deserializer=messaging__pb2.SendMessageResponse.FromString,
                 _registered_method=True)
+        self.SendMessages = channel.stream_unary(
+                '/messenger.MessagingService/SendMessages',
+                request_serializer=messaging__pb2.SendMessageRequest.SerializeToString,
+                response_deserializer=messaging__pb2.SendMessagesResponse.FromString,
+                _registered_method=True)
         self.CreateThread = channel.unary_unary(
                 '/messenger.MessagingService/CreateThread',
                 request_serializer=messaging__pb2.CreateThreadRequest.SerializeToString,
@@ -59,6 +69,11 @@ class MessagingServiceStub(object):
                 request_serializer=messaging__pb2.JoinThreadRequest.SerializeToString,
                 response_deserializer=messaging__pb2.JoinThreadResponse.FromString,
                 _registered_method=True)
+        self.MarkRead = channel.unary_unary(
+                '/messenger.MessagingService/MarkRead',
+                request_serializer=messaging__pb2.MarkReadRequest.SerializeToString,
+                response_deserializer=messaging__pb2.MarkReadResponse.FromString,
+                _registered_method=True)
         self.LeaveThread = channel.unary_unary(
                 '/messenger.MessagingService/LeaveThread',
                 request_serializer=messaging__pb2.LeaveThreadRequest.SerializeToString,
@@ -69,6 +84,11 @@ class MessagingServiceStub(object):
                 request_serializer=messaging__pb2.StreamThreadMessagesRequest.SerializeToString,
                 response_deserializer=messaging__pb2.MessageStreamResponse.FromString,
                 _registered_method=True)
+        self.StreamUserEvents = channel.unary_stream(
+                '/messenger.MessagingService/StreamUserEvents',
+                request_serializer=messaging__pb2.StreamUserEventsRequest.SerializeToString,
+                response_deserializer=messaging__pb2.UserEvent.FromString,
+                _registered_method=True)
 
 
 class MessagingServiceServicer(object):
@@ -86,12 +106,26 @@ class MessagingServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SearchMessages(self, request, context):
+        """Full-text search over the caller's threads, best matches first
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def SendMessage(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def SendMessages(self, request_iterator, context):
+        """Bulk send for bots and importers, messages may go to any of the caller's threads
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def CreateThread(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -104,6 +138,13 @@ class MessagingServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def MarkRead(self, request, context):
+        """Moves the caller's read marker in a thread forward, markers never move back
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def LeaveThread(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -116,6 +157,13 @@ class MessagingServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamUserEvents(self, request, context):
+        """One stream for every thread the user participates in
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_MessagingServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -129,11 +177,21 @@ def add_MessagingServiceServicer_to_server(servicer, server):
                     request_deserializer=messaging__pb2.GetMessagesRequest.FromString,
                     response_serializer=messaging__pb2.GetMessagesResponse.SerializeToString,
             ),
+            'SearchMessages': grpc.unary_unary_rpc_method_handler(
+                    servicer.SearchMessages,
+                    request_deserializer=messaging__pb2.SearchMessagesRequest.FromString,
+                    response_serializer=messaging__pb2.SearchMessagesResponse.SerializeToString,
+            ),
             'SendMessage': grpc.unary_unary_rpc_method_handler(
                     servicer.SendMessage,
                     request_deserializer=messaging__pb2.SendMessageRequest.FromString,
                     response_serializer=messaging__pb2.SendMessageResponse.SerializeToString,
             ),
+            'SendMessages': grpc.stream_unary_rpc_method_handler(
+                    servicer.SendMessages,
+                    request_deserializer=messaging__pb2.SendMessageRequest.FromString,
+                    response_serializer=messaging__pb2.SendMessagesResponse.SerializeToString,
+            ),
             'CreateThread': grpc.unary_unary_rpc_method_handler(
                     servicer.CreateThread,
                     request_deserializer=messaging__pb2.CreateThreadRequest.FromString,
@@ -144,6 +202,11 @@ def add_MessagingServiceServicer_to_server(servicer, server):
                     request_deserializer=messaging__pb2.JoinThreadRequest.FromString,
                     response_serializer=messaging__pb2.JoinThreadResponse.SerializeToString,
             ),
+            'MarkRead': grpc.unary_unary_rpc_method_handler(
+                    servicer.MarkRead,
+                    request_deserializer=messaging__pb2.MarkReadRequest.FromString,
+                    response_serializer=messaging__pb2.MarkReadResponse.SerializeToString,
+            ),
             'LeaveThread': grpc.unary_unary_rpc_method_handler(
                     servicer.LeaveThread,
                     request_deserializer=messaging__pb2.LeaveThreadRequest.FromString,
@@ -154,6 +217,11 @@ def add_MessagingServiceServicer_to_server(servicer, server):
                     request_deserializer=messaging__pb2.StreamThreadMessagesRequest.FromString,
                     response_serializer=messaging__pb2.MessageStreamResponse.SerializeToString,
             ),
+            'StreamUserEvents': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamUserEvents,
+                    request_deserializer=messaging__pb2.StreamUserEventsRequest.FromString,
+                    response_serializer=messaging__pb2.UserEvent.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'messenger.MessagingService', rpc_method_handlers)
@@ -219,6 +287,33 @@ class MessagingService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SearchMessages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessagingService/SearchMessages',
+            messaging__pb2.SearchMessagesRequest.SerializeToString,
+            messaging__pb2.SearchMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def SendMessage(request,
             target,
@@ -246,6 +341,33 @@ class MessagingService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def SendMessages(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/messenger.MessagingService/SendMessages',
+            messaging__pb2.SendMessageRequest.SerializeToString,
+            messaging__pb2.SendMessagesResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def CreateThread(request,
             target,
@@ -300,6 +422,33 @@ class MessagingService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def MarkRead(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/messenger.MessagingService/MarkRead',
+            messaging__pb2.MarkReadRequest.SerializeToString,
+            messaging__pb2.MarkReadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def LeaveThread(request,
             target,
@@ -353,3 +502,30 @@ class MessagingService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def StreamUserEvents(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/messenger.MessagingService/StreamUserEvents',
+            messaging__pb2.StreamUserEventsRequest.SerializeToString,
+            messaging__pb2.UserEvent.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
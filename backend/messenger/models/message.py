@@ -20,6 +20,7 @@ class Message(Base):
     
     __table_args__ = (
         Index('ix_message_thread_created', 'thread_id', 'created_at'),
+        Index('ix_message_thread_id', 'thread_id', 'id'),  # keyset pagination
     )
     
     def __repr__(self):
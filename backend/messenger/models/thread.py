@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, or_
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from datetime import UTC
 
 from messenger.config.database import Base
 
+LAST_MESSAGE_PREVIEW_LENGTH = 200
+
 class Thread(Base):
     __tablename__ = "threads"
     
@@ -13,9 +15,52 @@ class Thread(Base):
     created_at = Column(DateTime, default=datetime.now(UTC))
     updated_at = Column(DateTime, default=datetime.now(UTC), onupdate=datetime.now(UTC))
     
+    # denormalized copy of the newest message, maintained by the write path so the
+    # inbox never has to touch the messages table
+    last_message_id = Column(Integer)
+    last_message_preview = Column(String(LAST_MESSAGE_PREVIEW_LENGTH))
+    last_message_sender_id = Column(Integer)
+    last_message_sender_username = Column(String(50))
+    last_message_created_at = Column(DateTime)
+    
+    # the two participants of a DM, lower id first, null for every other thread.
+    # Unique, so there is at most one DM per pair
+    dm_min_user_id = Column(Integer)
+    dm_max_user_id = Column(Integer)
+    
     messages = relationship("Message", back_populates="thread", order_by="Message.created_at")
     participants = relationship("ThreadParticipant", back_populates="thread")
     
+    __table_args__ = (
+        Index('ix_thread_dm_pair', 'dm_min_user_id', 'dm_max_user_id', unique=True),
+    )
+    
+    def set_last_message(self, message, sender_username):
+        values = Thread.last_message_values(
+            message.id, message.content, message.sender_id, sender_username, message.created_at
+        )
+        for column, value in values.items():
+            setattr(self, column, value)
+    
+    @staticmethod
+    def last_message_values(message_id, content, sender_id, sender_username, created_at):
+        # column values for a thread whose newest message is this one, also used
+        # directly in UPDATE statements by the write path
+        return {
+            "last_message_id": message_id,
+            "last_message_preview": content[:LAST_MESSAGE_PREVIEW_LENGTH],
+            "last_message_sender_id": sender_id,
+            "last_message_sender_username": sender_username,
+            "last_message_created_at": created_at,
+            "updated_at": created_at,
+        }
+    
+    @staticmethod
+    def last_message_older_than(message_id):
+        # UPDATE criteria so the pointer only moves forward, concurrent writers can
+        # commit out of order
+        return or_(Thread.last_message_id.is_(None), Thread.last_message_id < message_id)
+    
     def __repr__(self):
         return f"<Thread(id={self.id}, name='{self.name}')>"
 
@@ -26,6 +71,9 @@ class ThreadParticipant(Base):
     thread_id = Column(Integer, ForeignKey("threads.id"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     joined_at = Column(DateTime, default=datetime.now(UTC))
+    # newest message this participant has read, null if none. Written by the
+    # coalesced MarkRead flusher and only ever moves forward
+    last_read_message_id = Column(Integer)
     
     thread = relationship("Thread", back_populates="participants")
     user = relationship("User", back_populates="thread_participants")
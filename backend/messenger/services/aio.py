@@ -0,0 +1,175 @@
+"""grpc.aio servicers.
+
+Unary handlers reuse the sync services and run on a bounded thread pool, so
+the database code is shared between both server modes. Streams are native
+coroutines: an idle StreamThreadMessages call is a suspended coroutine
+waiting on its subscription rather than a pinned worker thread.
+"""
+import asyncio
+import logging
+
+import grpc
+
+from messenger.generated import auth_pb2_grpc, messaging_pb2_grpc
+from messenger.services.messaging_service import SendMessagesCall, ThreadStreamCall, UserStreamCall
+from messenger.services.subscriptions import AsyncSubscription
+
+logger = logging.getLogger(__name__)
+
+class _ExecutorContext:
+    # Sync handlers run off the event loop, so the status they set is collected
+    # here and applied to the real aio context back on the loop
+    def __init__(self, context):
+        self._context = context
+        # set when the auth interceptor verified a bearer token
+        self.user_info = getattr(context, 'user_info', None)
+        self._code = None
+        self._details = None
+    
+    def set_code(self, code):
+        self._code = code
+    
+    def set_details(self, details):
+        self._details = details
+    
+    def invocation_metadata(self):
+        return self._context.invocation_metadata()
+    
+    def is_active(self):
+        return not self._context.done()
+    
+    def apply(self):
+        if self._code is not None:
+            self._context.set_code(self._code)
+        if self._details is not None:
+            self._context.set_details(self._details)
+
+async def _run_sync(executor, method, request, context):
+    executor_context = _ExecutorContext(context)
+    loop = asyncio.get_running_loop()
+    response = await loop.run_in_executor(executor, method, request, executor_context)
+    executor_context.apply()
+    return response
+
+class AsyncAuthService(auth_pb2_grpc.AuthServiceServicer):
+    def __init__(self, service, executor):
+        self.service = service
+        self.executor = executor
+    
+    async def Login(self, request, context):
+        return await _run_sync(self.executor, self.service.Login, request, context)
+    
+    async def ValidateToken(self, request, context):
+        return await _run_sync(self.executor, self.service.ValidateToken, request, context)
+    
+    async def RefreshToken(self, request, context):
+        return await _run_sync(self.executor, self.service.RefreshToken, request, context)
+
+class AsyncMessagingService(messaging_pb2_grpc.MessagingServiceServicer):
+    def __init__(self, service, executor):
+        # service is the sync MessagingService, which also owns the subscriber registry
+        self.service = service
+        self.executor = executor
+    
+    async def GetThreads(self, request, context):
+        return await _run_sync(self.executor, self.service.GetThreads, request, context)
+    
+    async def GetMessages(self, request, context):
+        return await _run_sync(self.executor, self.service.GetMessages, request, context)
+    
+    async def SearchMessages(self, request, context):
+        return await _run_sync(self.executor, self.service.SearchMessages, request, context)
+    
+    async def SendMessage(self, request, context):
+        return await _run_sync(self.executor, self.service.SendMessage, request, context)
+    
+    async def SendMessages(self, request_iterator, context):
+        # the stream is read on the loop, each full batch is written on the executor
+        call = SendMessagesCall(context)
+        loop = asyncio.get_running_loop()
+        
+        try:
+            async for request in request_iterator:
+                rejected = call.add(request)
+                if rejected:
+                    return rejected
+                
+                batch = call.take_batch()
+                if batch:
+                    call.sent(await loop.run_in_executor(self.executor, self.service._send_message_batch, *batch))
+            
+            batch = call.take_batch(final=True)
+            if batch:
+                call.sent(await loop.run_in_executor(self.executor, self.service._send_message_batch, *batch))
+            
+            return call.response()
+        
+        except Exception as e:
+            return call.error_response(e)
+    
+    async def CreateThread(self, request, context):
+        return await _run_sync(self.executor, self.service.CreateThread, request, context)
+    
+    async def JoinThread(self, request, context):
+        return await _run_sync(self.executor, self.service.JoinThread, request, context)
+    
+    async def MarkRead(self, request, context):
+        return await _run_sync(self.executor, self.service.MarkRead, request, context)
+    
+    async def LeaveThread(self, request, context):
+        return await _run_sync(self.executor, self.service.LeaveThread, request, context)
+    
+    async def StreamThreadMessages(self, request, context):
+        call = ThreadStreamCall(self.service, request)
+        if not call.authenticate(context):
+            return
+        
+        loop = asyncio.get_running_loop()
+        error = await loop.run_in_executor(self.executor, call.check)
+        if error:
+            yield error
+            return
+        
+        subscription = AsyncSubscription(call.user_id, loop, last_message_id=call.resume_from)
+        
+        try:
+            yield call.subscribe(subscription)
+            for frame in await loop.run_in_executor(self.executor, call.replay):
+                yield frame
+            
+            # the coroutine is cancelled when the client goes away
+            while True:
+                response = await subscription.get()
+                if response is None:
+                    break
+                yield call.frame(response)
+        
+        finally:
+            call.close()
+        
+        details = call.overflow_details()
+        if details:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, details)
+    
+    async def StreamUserEvents(self, request, context):
+        call = UserStreamCall(self.service, request)
+        if not call.authenticate(context):
+            return
+        
+        subscription = AsyncSubscription(call.user_id, asyncio.get_running_loop())
+        
+        try:
+            yield call.subscribe(subscription)
+            
+            while True:
+                event = await subscription.get()
+                if event is None:
+                    break
+                yield call.frame(event)
+        
+        finally:
+            call.close()
+        
+        details = call.overflow_details()
+        if details:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, details)
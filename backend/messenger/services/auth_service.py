@@ -1,26 +1,32 @@
 import logging
-from datetime import datetime, timedelta, UTC
+import time
 
-import bcrypt
 import grpc
 import jwt
 
 from messenger.generated import auth_pb2, auth_pb2_grpc
 from messenger.models.user import User
-from messenger.utils.auth import JWT_SECRET, JWT_ALGORITHM, validate_jwt_token
-from messenger.config.database import get_db_session
-
-TOKEN_EXPIRY_HOURS = 24
+from messenger.utils.auth import decode_refresh_token, issue_tokens, validate_jwt_token
+from messenger.config.database import session_scope
+from messenger.utils.metrics import metrics
+from messenger.utils.passwords import PasswordCheckBusy, password_checker
 
 logger = logging.getLogger(__name__)
 
 class AuthService(auth_pb2_grpc.AuthServiceServicer):
-
+    
     def Login(self, request, context):
+        started = time.perf_counter()
         try:
-            db = get_db_session()
-            
-            user = db.query(User).filter(User.username == request.username).first()
+            return self._login(request, context)
+        finally:
+            metrics.observe("auth.login_seconds", time.perf_counter() - started)
+    
+    def _login(self, request, context):
+        try:
+            # released before hashing so a login storm doesn't hold pool connections
+            with session_scope() as db:
+                user = db.query(User).filter(User.username == request.username).first()
             
             if not user:
                 logger.info(f"Login failed: user not found - username: {request.username}")
@@ -32,8 +38,22 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
                     username=""
                 )
             
-            # Verify password using bcrypt
-            if not bcrypt.checkpw(request.password.encode('utf-8'), user.password_hash.encode('utf-8')):
+            # Verify password using bcrypt, in the password checker's process pool
+            try:
+                password_ok = password_checker.check_password(request.password, user.password_hash)
+            except PasswordCheckBusy:
+                logger.info(f"Login failed: too many logins in progress - username: {request.username}")
+                context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details("Too many logins in progress, try again shortly")
+                return auth_pb2.LoginResponse(
+                    success=False,
+                    token="",
+                    message="Too many logins in progress",
+                    user_id=0,
+                    username=""
+                )
+            
+            if not password_ok:
                 logger.info(f"Login failed: invalid password - username: {request.username}")
                 return auth_pb2.LoginResponse(
                     success=False,
@@ -43,15 +63,8 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
                     username=""
                 )
             
-            # Generate JWT token
-            payload = {
-                "user_id": user.id,
-                "username": user.username,
-                "exp": datetime.now(UTC) + timedelta(hours=TOKEN_EXPIRY_HOURS)
-            }
-            token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-            
-            db.close()
+            # Generate JWT tokens
+            token, refresh_token, expires_in = issue_tokens(user.id, user.username)
             
             logger.info(f"Login successful - user_id: {user.id}, username: {user.username}")
             
@@ -60,9 +73,11 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
                 token=token,
                 message="Login successful",
                 user_id=user.id,
-                username=user.username
+                username=user.username,
+                refresh_token=refresh_token,
+                expires_in=expires_in
             )
-            
+        
         except Exception as e:
             logger.error(f"Login error - username: {request.username}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -91,4 +106,34 @@ class AuthService(auth_pb2_grpc.AuthServiceServicer):
                 valid=False,
                 user_id=0,
                 username=""
-            )
\ No newline at end of file
+            )
+    
+    def RefreshToken(self, request, context):
+        # stateless rotation: no password check and no database lookup, the refresh
+        # token's signature and expiry are all that is checked
+        try:
+            user_info = decode_refresh_token(request.refresh_token)
+        except jwt.ExpiredSignatureError:
+            logger.info("Token refresh failed: refresh token expired")
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            context.set_details("Refresh token has expired")
+            return auth_pb2.RefreshTokenResponse(success=False, message="Refresh token has expired")
+        except jwt.InvalidTokenError:
+            logger.info("Token refresh failed: invalid refresh token")
+            context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            context.set_details("Invalid refresh token")
+            return auth_pb2.RefreshTokenResponse(success=False, message="Invalid refresh token")
+        
+        token, refresh_token, expires_in = issue_tokens(user_info['user_id'], user_info['username'])
+        metrics.incr("auth.token_refreshes")
+        
+        logger.info(f"Token refresh successful - user_id: {user_info['user_id']}, username: {user_info['username']}")
+        return auth_pb2.RefreshTokenResponse(
+            success=True,
+            token=token,
+            refresh_token=refresh_token,
+            message="Token refreshed",
+            user_id=user_info['user_id'],
+            username=user_info['username'],
+            expires_in=expires_in
+        )
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""Broadcast bus for fanning events out to every server replica.
+
+Each replica only holds its own streaming subscribers, so anything that has
+to reach a viewer (a new message, for example) is published on the bus and
+every replica dispatches it to its local handlers.
+
+Events are a kind plus keyword fields. Field values must be JSON-serializable
+or bytes (serialized protobufs).
+
+Whenever events may have been lost, handlers for RESYNC are called so anything
+kept current from events (message caches, replay rings) is dropped and rebuilt
+from the database.
+"""
+import base64
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+
+from messenger.config.database import engine
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps fan-out inside one process, "postgres" uses LISTEN/NOTIFY across replicas
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "memory")
+# dispatched with no fields when this replica may have missed events
+RESYNC = "resync"
+
+class BroadcastBus:
+    def __init__(self):
+        self.handlers = {}
+    
+    def on(self, kind, handler):
+        self.handlers[kind] = handler
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    def publish(self, kind, **fields):
+        raise NotImplementedError
+    
+    def publish_many(self, kind, events):
+        # events is a list of field dicts, published in order
+        for fields in events:
+            self.publish(kind, **fields)
+    
+    def _dispatch(self, kind, fields):
+        handler = self.handlers.get(kind)
+        if not handler:
+            return
+        try:
+            handler(**fields)
+        except Exception as e:
+            logger.error(f"Broadcast handler error - kind: {kind}, error: {str(e)}")
+
+class InMemoryBus(BroadcastBus):
+    # Single-process bus, also used in tests
+    def publish(self, kind, **fields):
+        self._dispatch(kind, fields)
+
+class PostgresBus(BroadcastBus):
+    """LISTEN/NOTIFY bus. Each replica holds one dedicated listener connection.
+    
+    Events are dispatched locally straight away and notifications from this
+    replica are skipped when they come back. NOTIFY payloads are limited to
+    8000 bytes, so if an event is too large its bytes and list fields (protos,
+    member ids) are dropped and the receiving handler gets None for them and has
+    to reload from the database.
+    
+    Notifications are lost while the listener reconnects and when a NOTIFY
+    fails. The listener dispatches RESYNC locally every time it starts
+    listening, and after a failed NOTIFY the next one from this replica is
+    preceded by a RESYNC for the replicas that missed it.
+    """
+    
+    CHANNEL = "messenger_events"
+    MAX_PAYLOAD_BYTES = 7900
+    POLL_TIMEOUT_SECONDS = 5
+    RECONNECT_DELAY_SECONDS = 1
+    
+    def __init__(self):
+        super().__init__()
+        self.replica_id = uuid.uuid4().hex
+        self._stopping = threading.Event()
+        self._listener = None
+        # set when a NOTIFY failed, other replicas need a RESYNC
+        self._resync_pending = False
+    
+    def start(self):
+        self._listener = threading.Thread(target=self._listen, name="broadcast-listener", daemon=True)
+        self._listener.start()
+        logger.info(f"Postgres broadcast bus started - replica_id: {self.replica_id}, channel: {self.CHANNEL}")
+    
+    def stop(self):
+        self._stopping.set()
+    
+    def publish(self, kind, **fields):
+        self._dispatch(kind, fields)
+        
+        # local subscribers already have the event, so a failed NOTIFY only affects other replicas
+        try:
+            self._notify([self._encode(kind, fields)])
+        except Exception as e:
+            self._resync_pending = True
+            logger.error(f"Broadcast publish error - kind: {kind}, error: {str(e)}")
+    
+    def publish_many(self, kind, events):
+        for fields in events:
+            self._dispatch(kind, fields)
+        
+        try:
+            if events:
+                self._notify([self._encode(kind, fields) for fields in events])
+        except Exception as e:
+            self._resync_pending = True
+            logger.error(f"Broadcast publish error - kind: {kind}, events: {len(events)}, error: {str(e)}")
+    
+    def _notify(self, payloads):
+        # every NOTIFY in one transaction, postgres delivers them together and in order.
+        # Led by a RESYNC when an earlier NOTIFY failed
+        resync = self._resync_pending
+        if resync:
+            payloads = [self._encode(RESYNC, {})] + payloads
+        
+        with engine.connect() as conn:
+            conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                [{"channel": self.CHANNEL, "payload": payload} for payload in payloads]
+            )
+            conn.commit()
+        
+        if resync:
+            self._resync_pending = False
+            logger.info(f"Broadcast resync sent - replica_id: {self.replica_id}")
+    
+    def _encode(self, kind, fields, trim=False):
+        encoded = {}
+        for name, value in fields.items():
+            if trim and isinstance(value, (bytes, list)):
+                value = None
+            elif isinstance(value, bytes):
+                value = {"b64": base64.b64encode(value).decode('ascii')}
+            encoded[name] = value
+        
+        payload = json.dumps({"origin": self.replica_id, "kind": kind, "fields": encoded})
+        if len(payload.encode('utf-8')) > self.MAX_PAYLOAD_BYTES and not trim:
+            return self._encode(kind, fields, trim=True)
+        return payload
+    
+    def _decode(self, payload):
+        event = json.loads(payload)
+        fields = {
+            name: base64.b64decode(value["b64"]) if isinstance(value, dict) and "b64" in value else value
+            for name, value in event["fields"].items()
+        }
+        return event["origin"], event["kind"], fields
+    
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                self._listen_once()
+            except Exception as e:
+                logger.error(f"Broadcast listener error, reconnecting - error: {str(e)}")
+                time.sleep(self.RECONNECT_DELAY_SECONDS)
+    
+    def _listen_once(self):
+        # dedicated connection taken out of the pool for the life of the listener
+        raw = engine.raw_connection()
+        conn = raw.driver_connection
+        raw.detach()
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.CHANNEL}")
+            
+            # anything published before LISTEN, or while reconnecting, was missed
+            self._dispatch(RESYNC, {})
+            
+            while not self._stopping.is_set():
+                readable, _, _ = select.select([conn], [], [], self.POLL_TIMEOUT_SECONDS)
+                if not readable:
+                    continue
+                
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    origin, kind, fields = self._decode(notify.payload)
+                    if origin != self.replica_id:
+                        self._dispatch(kind, fields)
+        finally:
+            conn.close()
+
+def create_bus():
+    if BROADCAST_BACKEND == "postgres":
+        return PostgresBus()
+    return InMemoryBus()
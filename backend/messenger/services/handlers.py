@@ -0,0 +1,43 @@
+"""Servicer registration for MessagingService.
+
+Mirrors the generated add_MessagingServiceServicer_to_server, except that
+server-streaming methods accept frames that are already serialized. A
+broadcast is encoded once and the same bytes object is handed to every
+subscriber, instead of each stream re-encoding the same message.
+"""
+import grpc
+from google.protobuf import message_factory
+
+from messenger.generated import messaging_pb2
+
+HANDLER_FACTORIES = {
+    (False, False): grpc.unary_unary_rpc_method_handler,
+    (False, True): grpc.unary_stream_rpc_method_handler,
+    (True, False): grpc.stream_unary_rpc_method_handler,
+    (True, True): grpc.stream_stream_rpc_method_handler,
+}
+
+def serialize_frame(response):
+    # pre-encoded broadcast frames pass straight through
+    if isinstance(response, bytes):
+        return response
+    return response.SerializeToString()
+
+def add_messaging_service_to_server(servicer, server):
+    service = messaging_pb2.DESCRIPTOR.services_by_name['MessagingService']
+    
+    rpc_method_handlers = {}
+    for method in service.methods:
+        request_class = message_factory.GetMessageClass(method.input_type)
+        response_class = message_factory.GetMessageClass(method.output_type)
+        factory = HANDLER_FACTORIES[(method.client_streaming, method.server_streaming)]
+        
+        rpc_method_handlers[method.name] = factory(
+            getattr(servicer, method.name),
+            request_deserializer=request_class.FromString,
+            response_serializer=serialize_frame if method.server_streaming else response_class.SerializeToString,
+        )
+    
+    generic_handler = grpc.method_handlers_generic_handler(service.full_name, rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers(service.full_name, rpc_method_handlers)
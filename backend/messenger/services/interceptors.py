@@ -0,0 +1,128 @@
+"""Authentication interceptors.
+
+Clients send their token as "authorization: Bearer <jwt>" call metadata. The
+token is checked before the request is deserialized or the handler runs, so a
+call with a bad token is rejected without touching the payload or a database
+session. A valid identity is handed to the handler as context.user_info, which
+messenger.utils.auth.authenticate picks up.
+
+Calls without the header go through untouched and the handler falls back to
+the token field in the request body, until every client sends the header.
+"""
+import logging
+
+import grpc
+
+from messenger.generated import messaging_pb2
+from messenger.services.handlers import HANDLER_FACTORIES
+from messenger.utils.auth import bearer_token, validate_jwt_token
+from messenger.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# AuthService stays public, Login is how a client gets a token in the first place
+AUTHENTICATED_PREFIX = f"/{messaging_pb2.DESCRIPTOR.services_by_name['MessagingService'].full_name}/"
+
+class _RejectContext:
+    # collects the status validate_jwt_token sets so it can be sent as the abort
+    def __init__(self):
+        self.code = grpc.StatusCode.UNAUTHENTICATED
+        self.details = "Invalid token"
+    
+    def set_code(self, code):
+        self.code = code
+    
+    def set_details(self, details):
+        self.details = details
+
+class AuthenticatedContext:
+    # the real servicer context plus the caller's identity
+    def __init__(self, context, user_info):
+        self._context = context
+        self.user_info = user_info
+    
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+def _method_behavior(handler):
+    for name in ('unary_unary', 'unary_stream', 'stream_unary', 'stream_stream'):
+        behavior = getattr(handler, name)
+        if behavior is not None:
+            return behavior
+    return None
+
+def _check(handler_call_details):
+    # (user_info, None) for a valid bearer token, (None, reject context) for a bad one,
+    # (None, None) when the call has no bearer token and the body token applies
+    token = bearer_token(handler_call_details.invocation_metadata)
+    if token is None:
+        return None, None
+    
+    reject = _RejectContext()
+    user_info = validate_jwt_token(token, reject)
+    if user_info is None:
+        metrics.incr("auth.rejected_calls")
+        logger.info(f"Call rejected: {reject.details} - method: {handler_call_details.method}")
+        return None, reject
+    return user_info, None
+
+def _wrap(handler, wrapper):
+    # same kind of handler, with wrapper(behavior) as its behavior
+    return HANDLER_FACTORIES[(handler.request_streaming, handler.response_streaming)](
+        wrapper(_method_behavior(handler)),
+        request_deserializer=handler.request_deserializer,
+        response_serializer=handler.response_serializer,
+    )
+
+def _reject(handler, abort):
+    # no request_deserializer, so the payload of a rejected call is never parsed
+    return HANDLER_FACTORIES[(handler.request_streaming, handler.response_streaming)](
+        abort,
+        response_serializer=handler.response_serializer,
+    )
+
+class AuthInterceptor(grpc.ServerInterceptor):
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(AUTHENTICATED_PREFIX):
+            return handler
+        
+        user_info, reject = _check(handler_call_details)
+        if reject is not None:
+            def abort(request_or_iterator, context):
+                context.abort(reject.code, reject.details)
+            return _reject(handler, abort)
+        if user_info is None:
+            return handler
+        
+        def wrapper(behavior):
+            def authenticated(request_or_iterator, context):
+                return behavior(request_or_iterator, AuthenticatedContext(context, user_info))
+            return authenticated
+        return _wrap(handler, wrapper)
+
+class AsyncAuthInterceptor(grpc.aio.ServerInterceptor):
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(AUTHENTICATED_PREFIX):
+            return handler
+        
+        user_info, reject = _check(handler_call_details)
+        if reject is not None:
+            async def abort(request_or_iterator, context):
+                await context.abort(reject.code, reject.details)
+            return _reject(handler, abort)
+        if user_info is None:
+            return handler
+        
+        def wrapper(behavior):
+            if handler.response_streaming:
+                async def authenticated_stream(request_or_iterator, context):
+                    async for response in behavior(request_or_iterator, AuthenticatedContext(context, user_info)):
+                        yield response
+                return authenticated_stream
+            
+            async def authenticated(request_or_iterator, context):
+                return await behavior(request_or_iterator, AuthenticatedContext(context, user_info))
+            return authenticated
+        return _wrap(handler, wrapper)
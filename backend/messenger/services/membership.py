@@ -0,0 +1,78 @@
+"""Process-local index of thread membership.
+
+"Is user X in thread Y" is asked by nearly every call, so each thread's set
+of participant ids is loaded once and then answered from memory. Entries
+expire after MEMBERSHIP_CACHE_TTL_SECONDS and at most MEMBERSHIP_CACHE_THREADS
+threads are held, least recently used first out.
+
+Anything that changes a thread's participants must invalidate the thread on
+every replica. MessagingService does that from the broadcast "membership"
+event, which carries only the thread id so it always fits in a NOTIFY. Events
+can still be lost (while a listener reconnects, for one), so a denial answered
+from a cached set is checked against the database once before it stands.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from messenger.utils.metrics import metrics
+
+MEMBERSHIP_CACHE_THREADS = int(os.getenv("MEMBERSHIP_CACHE_THREADS", "10000"))
+MEMBERSHIP_CACHE_TTL_SECONDS = float(os.getenv("MEMBERSHIP_CACHE_TTL_SECONDS", "300"))
+
+class MembershipIndex:
+    def __init__(self, load, max_threads=None, ttl_seconds=None):
+        # load(thread_id) returns the thread's participant user ids from the database
+        self.load = load
+        self.max_threads = max_threads or MEMBERSHIP_CACHE_THREADS
+        self.ttl_seconds = ttl_seconds or MEMBERSHIP_CACHE_TTL_SECONDS
+        self._entries = OrderedDict()
+        # bumped by every invalidation, a load that overlaps one isn't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        
+        metrics.gauge("membership.threads", lambda: len(self._entries))
+    
+    def members(self, thread_id):
+        return self._lookup(thread_id)[0]
+    
+    def is_member(self, user_id, thread_id):
+        members, cached = self._lookup(thread_id)
+        if user_id in members or not cached:
+            return user_id in members
+        
+        # a cached set may have missed an invalidation, don't lock a member out on it
+        metrics.incr("membership.denial_rechecks")
+        return user_id in self._load(thread_id)
+    
+    def invalidate(self, thread_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(thread_id, None)
+    
+    def _lookup(self, thread_id):
+        # (members, whether they came from the cache)
+        with self._lock:
+            entry = self._entries.get(thread_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(thread_id)
+                metrics.incr("membership.hits")
+                return entry[1], True
+        
+        metrics.incr("membership.misses")
+        return self._load(thread_id), False
+    
+    def _load(self, thread_id):
+        with self._lock:
+            generation = self._generation
+        
+        members = frozenset(self.load(thread_id))
+        
+        with self._lock:
+            if generation == self._generation:
+                self._entries[thread_id] = (time.monotonic() + self.ttl_seconds, members)
+                self._entries.move_to_end(thread_id)
+                if len(self._entries) > self.max_threads:
+                    self._entries.popitem(last=False)
+        return members
@@ -0,0 +1,140 @@
+"""Hot-page cache of each active thread's most recent messages.
+
+Most GetMessages calls are for the first page of a thread someone just opened.
+The newest MESSAGE_CACHE_PAGE_SIZE messages of recently read threads are kept
+as prebuilt messaging_pb2.Message objects so that page is served without
+running the message query again.
+
+Entries are filled by GetMessages on a miss and kept current by every message
+delivered on this replica, which covers messages sent through other replicas
+too. Cold threads are evicted least recently used first once the encoded size
+of all cached messages passes MESSAGE_CACHE_MAX_BYTES. Everything is dropped
+when the broadcast bus may have lost messages, as a page missing one would be
+served until evicted.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from messenger.utils.metrics import metrics
+
+MESSAGE_CACHE_ENABLED = os.getenv("MESSAGE_CACHE_ENABLED", "true").lower() == "true"
+MESSAGE_CACHE_PAGE_SIZE = int(os.getenv("MESSAGE_CACHE_PAGE_SIZE", "50"))
+MESSAGE_CACHE_MAX_BYTES = int(os.getenv("MESSAGE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+class _CachedPage:
+    def __init__(self, messages, complete):
+        # newest first, at most page_size long
+        self.messages = messages
+        # True when the thread has no messages older than the ones held here
+        self.complete = complete
+        self.size = sum(message.ByteSize() for message in messages)
+
+class RecentMessageCache:
+    def __init__(self, page_size=None, max_bytes=None):
+        self.page_size = page_size or MESSAGE_CACHE_PAGE_SIZE
+        self.max_bytes = max_bytes or MESSAGE_CACHE_MAX_BYTES
+        self.size = 0
+        self._pages = OrderedDict()
+        # thread_id -> [fills in progress, messages delivered while they load, whether
+        # a clear happened meanwhile and the result must not be stored]
+        self._loading = {}
+        self._lock = threading.Lock()
+        
+        metrics.gauge("message_cache.threads", lambda: len(self._pages))
+        metrics.gauge("message_cache.bytes", lambda: self.size)
+    
+    def get(self, thread_id, limit):
+        # (the newest limit messages, whether the thread has older ones), or None if
+        # this thread's first page isn't cached
+        with self._lock:
+            page = self._pages.get(thread_id)
+            if page is not None and (limit <= len(page.messages) or page.complete):
+                self._pages.move_to_end(thread_id)
+                metrics.incr("message_cache.hits")
+                return page.messages[:limit], len(page.messages) > limit or not page.complete
+        metrics.incr("message_cache.misses")
+        return None
+    
+    def begin_fill(self, thread_id):
+        # call before loading the page from the database, so messages delivered
+        # while the query runs are not lost when the result is stored
+        with self._lock:
+            pending = self._loading.setdefault(thread_id, [0, [], False])
+            pending[0] += 1
+    
+    def fill(self, thread_id, messages):
+        # messages is the newest page_size + 1 messages of the thread, newest first,
+        # the extra one only says whether the thread has older messages
+        with self._lock:
+            pending = self._loading.get(thread_id)
+            delivered = []
+            if pending is not None:
+                delivered = pending[1]
+                pending[0] -= 1
+                if pending[0] <= 0:
+                    del self._loading[thread_id]
+                if pending[2]:
+                    # loaded from before a clear, it may be missing a lost message
+                    return
+            
+            complete = len(messages) <= self.page_size
+            current = self._pages.get(thread_id)
+            if current is not None:
+                # another fill got there first and may already have newer messages
+                delivered = delivered + current.messages
+                complete = complete or current.complete
+            merged, truncated = self._merge(messages, delivered)
+            self._store(thread_id, merged, complete and not truncated)
+    
+    def abort_fill(self, thread_id):
+        with self._lock:
+            pending = self._loading.get(thread_id)
+            if pending is not None:
+                pending[0] -= 1
+                if pending[0] <= 0:
+                    del self._loading[thread_id]
+    
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self.size = 0
+            for pending in self._loading.values():
+                pending[2] = True
+            metrics.incr("message_cache.clears")
+    
+    def append(self, thread_id, message):
+        with self._lock:
+            pending = self._loading.get(thread_id)
+            if pending is not None:
+                pending[1].append(message)
+            
+            page = self._pages.get(thread_id)
+            if page is None:
+                return
+            merged, truncated = self._merge(page.messages, [message])
+            # stays complete only if nothing fell off the end of the page
+            self._store(thread_id, merged, page.complete and not truncated)
+    
+    def _merge(self, messages, newer):
+        # called with the lock held, dedupes by id since a delivered message may also have been loaded
+        by_id = {message.id: message for message in messages}
+        for message in newer:
+            by_id.setdefault(message.id, message)
+        merged = sorted(by_id.values(), key=lambda message: message.id, reverse=True)
+        return merged[:self.page_size], len(merged) > self.page_size
+    
+    def _store(self, thread_id, messages, complete):
+        # called with the lock held
+        previous = self._pages.pop(thread_id, None)
+        if previous is not None:
+            self.size -= previous.size
+        
+        page = _CachedPage(messages, complete)
+        self._pages[thread_id] = page
+        self.size += page.size
+        
+        while self.size > self.max_bytes and len(self._pages) > 1:
+            _, evicted = self._pages.popitem(last=False)
+            self.size -= evicted.size
+            metrics.incr("message_cache.evictions")
@@ -1,57 +1,406 @@
 import logging
+import os
 import threading
-from datetime import datetime, UTC
 import grpc
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 
 from messenger.generated import messaging_pb2, messaging_pb2_grpc
 from messenger.models.user import User
 from messenger.models.thread import Thread, ThreadParticipant
 from messenger.models.message import Message
-from messenger.utils.auth import validate_jwt_token
-from messenger.config.database import get_db_session
+from messenger.utils.auth import authenticate
+from messenger.config.database import session_scope
+from messenger.services.broadcast import RESYNC, InMemoryBus
+from messenger.services.replay import ReplayBuffer
+from messenger.services.message_cache import MESSAGE_CACHE_ENABLED, RecentMessageCache
+from messenger.services.membership import MembershipIndex
+from messenger.services.read_markers import ReadMarkers
+from messenger.services.search import create_search_backend
+from messenger.services.user_directory import UserDirectory
+from messenger.services.subscriptions import Subscription
+from messenger.services.write_batcher import WRITE_BATCHING_ENABLED, WriteBatcher
+from messenger.utils.metrics import metrics
+from messenger.utils.timestamps import to_timestamp, utc_now
 
 logger = logging.getLogger(__name__)
 
+SLOW_CONSUMER_DETAILS = "Stream fell too far behind, reconnect and refetch missed messages"
+SLOW_CONSUMER_RESUME_DETAILS = "Stream fell too far behind, reconnect with last_seen_message_id={last_message_id} to resume"
+# a resume further behind than this gets a MissedMessages marker instead of a replay
+REPLAY_MAX_MESSAGES = int(os.getenv("REPLAY_MAX_MESSAGES", "500"))
+# the MissedMessages count for such a resume stops here
+MISSED_COUNT_CAP = 10000
+# unread counts stop here, so an inbox load costs the same however far behind a reader is
+UNREAD_COUNT_CAP = 100
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# SendMessages commits the stream in multi-row inserts of up to this many messages
+SEND_MESSAGES_BATCH_SIZE = int(os.getenv("SEND_MESSAGES_BATCH_SIZE", "500"))
+
+class SendMessagesCall:
+    """State of one SendMessages stream.
+    
+    The sync and aio handlers feed every request through add and write each
+    batch that take_batch hands back, so they only differ in how the stream is
+    read and where a batch is written. The caller is authenticated once, from
+    the call metadata or the first request's token. Later tokens are ignored.
+    """
+    
+    def __init__(self, context):
+        self.context = context
+        # set when the auth interceptor verified a bearer token
+        self.user_info = getattr(context, 'user_info', None)
+        self.results = []
+        self.batch = []
+    
+    def add(self, request):
+        # Returns the response that ends the call when request's token is invalid, otherwise None
+        if self.user_info is None:
+            self.user_info = authenticate(request, self.context)
+            if not self.user_info:
+                logger.info("SendMessages failed: invalid or expired token")
+                return messaging_pb2.SendMessagesResponse(success=False, message="Invalid token")
+        
+        self.batch.append(request)
+        return None
+    
+    def take_batch(self, final=False):
+        # (user_id, requests) once SEND_MESSAGES_BATCH_SIZE requests are waiting, or
+        # whatever is left when final, otherwise None
+        if not self.batch or (len(self.batch) < SEND_MESSAGES_BATCH_SIZE and not final):
+            return None
+        batch, self.batch = self.batch, []
+        return self.user_info['user_id'], batch
+    
+    def sent(self, results):
+        self.results.extend(results)
+    
+    def response(self):
+        if self.user_info is None:
+            # an empty stream without a bearer token never said who is sending
+            logger.info("SendMessages failed: missing token")
+            self.context.set_code(grpc.StatusCode.UNAUTHENTICATED)
+            self.context.set_details("Missing token")
+            return messaging_pb2.SendMessagesResponse(success=False, message="Invalid token")
+        
+        sent = sum(1 for result in self.results if result.message_id)
+        logger.info(f"SendMessages finished - user_id: {self.user_info['user_id']}, sent: {sent}, failed: {len(self.results) - sent}")
+        
+        if sent < len(self.results):
+            return messaging_pb2.SendMessagesResponse(
+                success=False,
+                message=f"{len(self.results) - sent} of {len(self.results)} messages were not sent",
+                results=self.results
+            )
+        return messaging_pb2.SendMessagesResponse(
+            success=True,
+            message="Messages sent successfully",
+            results=self.results
+        )
+    
+    def error_response(self, e):
+        user_id = self.user_info['user_id'] if self.user_info else None
+        logger.error(f"SendMessages error - user_id: {user_id}, messages: {len(self.results) + len(self.batch)}, error: {str(e)}")
+        self.context.set_code(grpc.StatusCode.INTERNAL)
+        self.context.set_details(f"Internal server error: {str(e)}")
+        return messaging_pb2.SendMessagesResponse(
+            success=False,
+            message="Internal server error",
+            results=self.results
+        )
+
+class ThreadStreamCall:
+    """State of one StreamThreadMessages call.
+    
+    Used by the sync and aio handlers alike, which only differ in how they wait
+    for frames and where the blocking steps (check and replay) run. Everything
+    else lives here: the permission check, where a resume starts, handing off
+    from the replay to live frames, cleanup and the slow-consumer status.
+    """
+    
+    def __init__(self, service, request):
+        self.service = service
+        self.request = request
+        self.thread_id = request.thread_id
+        self.user_id = None
+        self.resume_from = 0
+        self.subscription = None
+    
+    def authenticate(self, context):
+        # False when the token is invalid, the stream then just ends
+        user_info = authenticate(self.request, context)
+        if not user_info:
+            logger.info(f"StreamThreadMessages failed: invalid or expired token - thread_id: {self.thread_id}")
+            return False
+        self.user_id = user_info['user_id']
+        return True
+    
+    def check(self):
+        # Blocking. Returns the response that ends the stream when the caller can't
+        # read the thread, otherwise None
+        try:
+            if not self.service._is_participant(self.user_id, self.thread_id):
+                logger.info(f"StreamThreadMessages failed: permission denied - user_id: {self.user_id}, thread_id: {self.thread_id}")
+                return messaging_pb2.MessageStreamResponse(error="You are not a participant in this thread")
+            
+            # read before subscribing, so a resume from here can't skip anything the stream buffers
+            self.resume_from = self.request.last_seen_message_id or self.service._thread_last_message_id(self.thread_id)
+        
+        except Exception as e:
+            logger.error(f"StreamThreadMessages error - user_id: {self.user_id}, thread_id: {self.thread_id}, error: {str(e)}")
+            return messaging_pb2.MessageStreamResponse(error=f"Internal server error: {str(e)}")
+        return None
+    
+    def subscribe(self, subscription):
+        # registers subscription and returns the connected status frame
+        self.subscription = subscription
+        self.service._subscribe(self.thread_id, subscription)
+        logger.info(f"StreamThreadMessages started - user_id: {self.user_id}, thread_id: {self.thread_id}, last_seen_message_id: {self.request.last_seen_message_id}")
+        return messaging_pb2.MessageStreamResponse(
+            status=messaging_pb2.ConnectionStatus(connected=True, message="Connected to thread stream")
+        )
+    
+    def replay(self):
+        # Blocking. Frames to send before the live ones, empty unless resuming. Runs after
+        # subscribe, so anything sent meanwhile is buffered and the subscription drops
+        # the copies the replay already sent
+        if not self.request.last_seen_message_id:
+            return []
+        frames, message_ids, last_message_id = self.service._replay_frames(self.thread_id, self.request.last_seen_message_id)
+        self.subscription.replayed(message_ids, last_message_id)
+        return frames
+    
+    def frame(self, response):
+        # what the subscription handed out, ready to send
+        if isinstance(response, messaging_pb2.MissedMessages):
+            return messaging_pb2.MessageStreamResponse(missed=response)
+        return response
+    
+    def close(self):
+        if self.subscription is None:
+            return
+        self.subscription.close()
+        self.service._unsubscribe(self.thread_id, self.subscription)
+        logger.info(f"StreamThreadMessages ended - user_id: {self.user_id}, thread_id: {self.thread_id}, dropped: {self.subscription.dropped}")
+    
+    def overflow_details(self):
+        # RESOURCE_EXHAUSTED details when the stream was cut off as a slow consumer, otherwise None
+        if self.subscription is None or not self.subscription.overflowed:
+            return None
+        logger.info(f"StreamThreadMessages disconnected slow consumer - user_id: {self.user_id}, thread_id: {self.thread_id}")
+        if not self.subscription.last_message_id:
+            # the thread was empty when the stream started, and a last_seen_message_id
+            # of 0 would start a new stream rather than resume
+            return SLOW_CONSUMER_DETAILS
+        return SLOW_CONSUMER_RESUME_DETAILS.format(last_message_id=self.subscription.last_message_id)
+
+class UserStreamCall:
+    # State of one StreamUserEvents call, shared by both servers like ThreadStreamCall
+    def __init__(self, service, request):
+        self.service = service
+        self.request = request
+        self.user_id = None
+        self.subscription = None
+    
+    def authenticate(self, context):
+        user_info = authenticate(self.request, context)
+        if not user_info:
+            logger.info("StreamUserEvents failed: invalid or expired token")
+            return False
+        self.user_id = user_info['user_id']
+        return True
+    
+    def subscribe(self, subscription):
+        self.subscription = subscription
+        self.service._subscribe_user(subscription)
+        logger.info(f"StreamUserEvents started - user_id: {self.user_id}")
+        return messaging_pb2.UserEvent(
+            status=messaging_pb2.ConnectionStatus(connected=True, message="Connected to user event stream")
+        )
+    
+    def frame(self, event):
+        if isinstance(event, messaging_pb2.MissedMessages):
+            return messaging_pb2.UserEvent(missed=event)
+        return event
+    
+    def close(self):
+        if self.subscription is None:
+            return
+        self.subscription.close()
+        self.service._unsubscribe_user(self.subscription)
+        logger.info(f"StreamUserEvents ended - user_id: {self.user_id}, dropped: {self.subscription.dropped}")
+    
+    def overflow_details(self):
+        if self.subscription is None or not self.subscription.overflowed:
+            return None
+        logger.info(f"StreamUserEvents disconnected slow consumer - user_id: {self.user_id}")
+        return SLOW_CONSUMER_DETAILS
+
 class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
-    def __init__(self):
-        # Thread ID -> list of (user_id, response_queue) tuples for connected clients
+    def __init__(self, bus=None):
+        # Thread ID -> list of Subscription objects for connected clients on this replica
         self.subscribers = {}
+        # User ID -> list of Subscription objects for StreamUserEvents clients on this replica
+        self.user_subscribers = {}
         self.lock = threading.Lock()
+        # recent frames per thread for streams resuming from last_seen_message_id
+        self.replay = ReplayBuffer()
+        # first page of recently read threads, None when MESSAGE_CACHE_ENABLED is off
+        self.recent_messages = RecentMessageCache() if MESSAGE_CACHE_ENABLED else None
+        # thread_id -> participant ids, answers permission checks without a query
+        self.membership = MembershipIndex(self._load_thread_member_ids)
+        # id -> messaging_pb2.User for every proto that names a user
+        self.users = UserDirectory()
+        # full-text index over message content, postgres or sqlite FTS5
+        self.search = create_search_backend()
+        # MarkRead calls, written in batches by a background flusher
+        self.read_markers = ReadMarkers()
+        # group commit for SendMessage, None when WRITE_BATCHING_ENABLED is off
+        self.write_batcher = WriteBatcher(self._commit_messages) if WRITE_BATCHING_ENABLED else None
+        
+        # messages reach subscribers on every replica through the bus
+        self.bus = bus if bus is not None else InMemoryBus()
+        self.bus.on("message", self._deliver_message)
+        self.bus.on("thread", self._deliver_thread)
+        self.bus.on("membership", self._deliver_membership)
+        self.bus.on("user", self._deliver_user)
+        self.bus.on(RESYNC, self._resync)
+        self.bus.start()
+        
+        metrics.gauge("stream.subscribers", lambda: len(self.stream_stats()))
+        metrics.gauge("stream.max_depth", lambda: max((s['depth'] for s in self.stream_stats()), default=0))
+        metrics.gauge("stream.total_depth", lambda: sum(s['depth'] for s in self.stream_stats()))
+    
+    def stream_stats(self):
+        # per-stream buffer depth and drop counts for every stream connected to this replica
+        with self.lock:
+            return [
+                {
+                    'thread_id': thread_id,
+                    'user_id': subscription.user_id,
+                    'depth': subscription.depth,
+                    'dropped': subscription.dropped,
+                }
+                for thread_id, subscriptions in self.subscribers.items()
+                for subscription in subscriptions
+            ] + [
+                {
+                    'thread_id': None,
+                    'user_id': subscription.user_id,
+                    'depth': subscription.depth,
+                    'dropped': subscription.dropped,
+                }
+                for subscriptions in self.user_subscribers.values()
+                for subscription in subscriptions
+            ]
     
     def _thread_to_proto(self, thread, db):
-        participants = db.query(User).join(ThreadParticipant).filter(
-            ThreadParticipant.thread_id == thread.id
-        ).all()
+        return self._threads_to_protos([thread], db)[0]
+    
+    def _threads_to_protos(self, threads, db):
+        # Batched inbox loader: one query for all participants regardless of how many
+        # threads are passed in, usernames come from the user directory and last
+        # messages from the denormalized thread columns
+        if not threads:
+            return []
         
-        participant_protos = [
-            messaging_pb2.User(id=user.id, username=user.username)
-            for user in participants
-        ]
+        thread_ids = [thread.id for thread in threads]
         
-        last_message = db.query(Message).filter(
-            Message.thread_id == thread.id
-        ).order_by(Message.created_at.desc()).first()
-        
-        last_message_proto = None
-        if last_message:
-            sender = db.query(User).filter(User.id == last_message.sender_id).first()
-            last_message_proto = messaging_pb2.Message(
-                id=last_message.id,
-                content=last_message.content,
-                sender_id=last_message.sender_id,
-                sender_username=sender.username if sender else "Unknown",
-                created_at=int(last_message.created_at.timestamp())
+        participant_rows = db.query(
+            ThreadParticipant.thread_id, ThreadParticipant.user_id
+        ).filter(
+            ThreadParticipant.thread_id.in_(thread_ids)
+        ).order_by(ThreadParticipant.thread_id, ThreadParticipant.id).all()
+        
+        users = self.users.get_many({participant_id for _, participant_id in participant_rows})
+        participants_by_thread = {thread_id: [] for thread_id in thread_ids}
+        for thread_id, participant_id in participant_rows:
+            if participant_id in users:
+                participants_by_thread[thread_id].append(users[participant_id])
+        
+        return [
+            messaging_pb2.Thread(
+                id=thread.id,
+                name=thread.name or "",
+                participants=participants_by_thread[thread.id],
+                last_message=self._last_message_to_proto(thread),
+                updated_at=to_timestamp(thread.updated_at)
             )
+            for thread in threads
+        ]
+    
+    def _last_message_to_proto(self, thread):
+        if thread.last_message_id is None:
+            return None
+        
+        return messaging_pb2.Message(
+            id=thread.last_message_id,
+            content=thread.last_message_preview or "",
+            sender_id=thread.last_message_sender_id,
+            sender_username=thread.last_message_sender_username or "Unknown",
+            created_at=to_timestamp(thread.last_message_created_at),
+            thread_id=thread.id
+        )
+    
+    def _insert_message(self, db, message, sender_username):
+        # Inserts a transient Message and points its thread's last-message columns at
+        # it, returning the new id. Core statements only, so nothing is flushed,
+        # selected back or refreshed after the commit. On postgres both writes are a
+        # single statement
+        message_values = {
+            "content": message.content,
+            "sender_id": message.sender_id,
+            "thread_id": message.thread_id,
+            "created_at": message.created_at,
+        }
+        
+        if db.get_bind().dialect.name == "postgresql":
+            inserted = insert(Message).values(**message_values).returning(Message.id, Message.thread_id).cte("new_message")
+            thread_update = update(Thread).where(
+                Thread.id == inserted.c.thread_id,
+                Thread.last_message_older_than(inserted.c.id)
+            ).values(
+                **Thread.last_message_values(inserted.c.id, message.content, message.sender_id, sender_username, message.created_at)
+            ).cte("thread_update")
+            return db.execute(select(inserted.c.id).add_cte(thread_update)).scalar_one()
+        
+        message_id = db.execute(insert(Message).values(**message_values)).inserted_primary_key[0]
+        db.execute(update(Thread).where(
+            Thread.id == message.thread_id,
+            Thread.last_message_older_than(message_id)
+        ).values(
+            **Thread.last_message_values(message_id, message.content, message.sender_id, sender_username, message.created_at)
+        ))
+        return message_id
+    
+    def _insert_messages(self, db, rows, sender_usernames):
+        # Multi-row insert of message column dicts plus one last-message update per
+        # thread, pointing at its newest message in the batch. Returns the new ids in
+        # row order. Core statements on the table, no ORM objects per row
+        message_ids = db.execute(
+            insert(Message.__table__).returning(Message.__table__.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
         
-        return messaging_pb2.Thread(
-            id=thread.id,
-            name=thread.name or "",
-            participants=participant_protos,
-            last_message=last_message_proto,
-            updated_at=int(thread.updated_at.timestamp())
+        newest_by_thread = {}
+        for row, message_id in zip(rows, message_ids):
+            newest_by_thread[row["thread_id"]] = (row, message_id)
+        
+        db.execute(
+            update(Thread.__table__).where(
+                Thread.id == bindparam("thread_id_"),
+                Thread.last_message_older_than(bindparam("message_id_"))
+            ),
+            [
+                {
+                    "thread_id_": thread_id,
+                    "message_id_": message_id,
+                    **Thread.last_message_values(message_id, row["content"], row["sender_id"], sender_usernames[row["sender_id"]], row["created_at"]),
+                }
+                for thread_id, (row, message_id) in newest_by_thread.items()
+            ]
         )
+        return message_ids
     
     def _message_to_proto(self, message, sender_username):
         return messaging_pb2.Message(
@@ -59,25 +408,40 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
             content=message.content,
             sender_id=message.sender_id,
             sender_username=sender_username,
-            created_at=int(message.created_at.timestamp())
+            created_at=to_timestamp(message.created_at),
+            thread_id=message.thread_id
         )
     
-    def _find_existing_dm_thread(self, db, user_id_1, user_id_2):
-        return db.query(Thread).join(ThreadParticipant).filter(
-            Thread.name.is_(None)
-        ).group_by(Thread.id).having(
-            func.count(ThreadParticipant.user_id) == 2
-        ).filter(
-            Thread.id.in_(
-                db.query(ThreadParticipant.thread_id)
-                .filter(ThreadParticipant.user_id.in_([user_id_1, user_id_2]))
-                .group_by(ThreadParticipant.thread_id)
-                .having(func.count(ThreadParticipant.user_id) == 2)
+    def _messages_to_protos(self, messages):
+        # sender usernames come from the user directory rather than a join
+        senders = self.users.get_many({message.sender_id for message in messages})
+        return [
+            self._message_to_proto(
+                message,
+                senders[message.sender_id].username if message.sender_id in senders else "Unknown"
             )
+            for message in messages
+        ]
+    
+    def _find_existing_dm_thread(self, db, user_id_1, user_id_2):
+        # one probe of the unique DM pair index
+        return db.query(Thread).filter(
+            Thread.dm_min_user_id == min(user_id_1, user_id_2),
+            Thread.dm_max_user_id == max(user_id_1, user_id_2)
         ).first()
     
+    def _existing_dm_response(self, db, thread, user_id, participant_users):
+        thread_proto = self._thread_to_proto(thread, db)
+        
+        logger.info(f"CreateThread found existing DM - user_id: {user_id}, thread_id: {thread.id}, participants: {[u.username for u in participant_users]}")
+        return messaging_pb2.CreateThreadResponse(
+            success=True,
+            message="Found existing conversation",
+            thread=thread_proto
+        )
+    
     def GetThreads(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info("GetThreads failed: invalid or expired token")
             return messaging_pb2.GetThreadsResponse()
@@ -85,30 +449,44 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         user_id = user_info['user_id']
         
         try:
-            db = get_db_session()
-            
-            threads = db.query(Thread).join(ThreadParticipant).filter(
-                ThreadParticipant.user_id == user_id
-            ).order_by(Thread.updated_at.desc()).all()
+            # the caller's own pending MarkRead calls land before their markers are read
+            self.read_markers.flush(user_id)
             
-            thread_protos = []
-            for thread in threads:
-                thread_proto = self._thread_to_proto(thread, db)
-                thread_protos.append(thread_proto)
+            with session_scope() as db:
+                rows = db.query(
+                    Thread, ThreadParticipant.last_read_message_id, self._unread_count(user_id)
+                ).join(ThreadParticipant).filter(
+                    ThreadParticipant.user_id == user_id
+                ).order_by(Thread.updated_at.desc()).all()
+                
+                thread_protos = self._threads_to_protos([thread for thread, _, _ in rows], db)
             
-            db.close()
+            for thread_proto, (_, last_read_message_id, unread_count) in zip(thread_protos, rows):
+                thread_proto.last_read_message_id = last_read_message_id or 0
+                thread_proto.unread_count = unread_count
             
             logger.info(f"GetThreads successful - user_id: {user_id}, threads_count: {len(thread_protos)}")
             return messaging_pb2.GetThreadsResponse(threads=thread_protos)
-            
+        
         except Exception as e:
             logger.error(f"GetThreads error - user_id: {user_id}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Internal server error: {str(e)}")
             return messaging_pb2.GetThreadsResponse()
     
+    def _unread_count(self, user_id):
+        # Scalar subquery for GetThreads, correlated to the caller's ThreadParticipant
+        # row: messages from others after their read marker, counted up to
+        # UNREAD_COUNT_CAP along the (thread_id, id) index
+        unread = select(Message.id).where(
+            Message.thread_id == ThreadParticipant.thread_id,
+            Message.id > func.coalesce(ThreadParticipant.last_read_message_id, 0),
+            Message.sender_id != user_id
+        ).correlate(ThreadParticipant).limit(UNREAD_COUNT_CAP).subquery()
+        return select(func.count()).select_from(unread).scalar_subquery()
+    
     def GetMessages(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info(f"GetMessages failed: invalid or expired token - thread_id: {request.thread_id}")
             return messaging_pb2.GetMessagesResponse()
@@ -116,14 +494,7 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         user_id = user_info['user_id']
         
         try:
-            db = get_db_session()
-            
-            participant = db.query(ThreadParticipant).filter(
-                ThreadParticipant.user_id == user_id,
-                ThreadParticipant.thread_id == request.thread_id
-            ).first()
-            
-            if not participant:
+            if not self._is_participant(user_id, request.thread_id):
                 logger.info(f"GetMessages failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
                 context.set_code(grpc.StatusCode.PERMISSION_DENIED)
                 context.set_details("You are not a participant in this thread")
@@ -132,34 +503,134 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
             limit = request.limit if request.limit > 0 else 50
             offset = request.offset if request.offset > 0 else 0
             
-            # eager loading
-            messages = db.query(Message).options(
-                joinedload(Message.sender)
-            ).filter(
-                Message.thread_id == request.thread_id
-            ).order_by(Message.created_at.desc()).limit(limit).offset(offset).all()
+            first_page = not request.before_id and not request.after_id and not offset
+            cached = None
+            if first_page and self.recent_messages and limit <= self.recent_messages.page_size:
+                cached = self.recent_messages.get(request.thread_id, limit)
+                if cached is None:
+                    # load the whole cached page even if fewer were asked for, then serve a slice of it
+                    self.recent_messages.begin_fill(request.thread_id)
+                    try:
+                        with session_scope() as db:
+                            page = self._load_first_page(db, request.thread_id, self.recent_messages.page_size + 1)
+                    except Exception:
+                        self.recent_messages.abort_fill(request.thread_id)
+                        raise
+                    self.recent_messages.fill(request.thread_id, page)
+                    cached = page[:limit], len(page) > limit
             
-            message_protos = []
-            for message in messages:
-                message_proto = self._message_to_proto(
-                    message, 
-                    message.sender.username if message.sender else "Unknown"
-                )
-                message_protos.append(message_proto)
+            if cached is not None:
+                message_protos, has_more = cached
+            else:
+                with session_scope() as db:
+                    query = db.query(Message).filter(
+                        Message.thread_id == request.thread_id
+                    )
+                    
+                    # cursors seek on ix_message_thread_id so every page costs the same,
+                    # offset is kept for older clients. One extra row says whether there
+                    # is another page
+                    if request.before_id > 0:
+                        messages = query.filter(
+                            Message.id < request.before_id
+                        ).order_by(Message.id.desc()).limit(limit + 1).all()
+                    elif request.after_id > 0:
+                        messages = query.filter(
+                            Message.id > request.after_id
+                        ).order_by(Message.id.asc()).limit(limit + 1).all()
+                    else:
+                        messages = query.order_by(Message.created_at.desc()).limit(limit + 1).offset(offset).all()
+                    
+                    has_more = len(messages) > limit
+                    messages = messages[:limit]
+                    if request.after_id > 0:
+                        messages.reverse()
+                    
+                    message_protos = self._messages_to_protos(messages)
             
-            db.close()
+            next_cursor = 0
+            if has_more:
+                if request.after_id > 0:
+                    next_cursor = max(message.id for message in message_protos)
+                else:
+                    next_cursor = min(message.id for message in message_protos)
             
             logger.info(f"GetMessages successful - user_id: {user_id}, thread_id: {request.thread_id}, messages_count: {len(message_protos)}")
-            return messaging_pb2.GetMessagesResponse(messages=message_protos)
-            
+            return messaging_pb2.GetMessagesResponse(messages=message_protos, next_cursor=next_cursor)
+        
         except Exception as e:
             logger.error(f"GetMessages error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Internal server error: {str(e)}")
             return messaging_pb2.GetMessagesResponse()
     
+    def _load_first_page(self, db, thread_id, limit):
+        # newest messages first, as protos ready for the recent message cache
+        messages = db.query(Message).filter(
+            Message.thread_id == thread_id
+        ).order_by(Message.id.desc()).limit(limit).all()
+        
+        return self._messages_to_protos(messages)
+    
+    def SearchMessages(self, request, context):
+        user_info = authenticate(request, context)
+        if not user_info:
+            logger.info(f"SearchMessages failed: invalid or expired token - thread_id: {request.thread_id}")
+            return messaging_pb2.SearchMessagesResponse()
+        
+        user_id = user_info['user_id']
+        
+        try:
+            query = request.query.strip()
+            after = self._decode_search_cursor(request.cursor)
+            if not query or (request.cursor and after is None):
+                logger.info(f"SearchMessages failed: invalid query or cursor - user_id: {user_id}, thread_id: {request.thread_id}")
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details("A search query is required" if not query else "Invalid cursor")
+                return messaging_pb2.SearchMessagesResponse()
+            
+            if request.thread_id and not self._is_participant(user_id, request.thread_id):
+                logger.info(f"SearchMessages failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
+                context.set_code(grpc.StatusCode.PERMISSION_DENIED)
+                context.set_details("You are not a participant in this thread")
+                return messaging_pb2.SearchMessagesResponse()
+            
+            limit = min(request.limit if request.limit > 0 else SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT)
+            
+            with session_scope() as db:
+                # one extra row says whether there is another page
+                rows = self.search.search(db, user_id, query, request.thread_id, limit + 1, after)
+                page = rows[:limit]
+                message_protos = self._messages_to_protos([message for message, _, _ in page])
+            
+            hits = [
+                messaging_pb2.SearchHit(message=message_proto, snippet=snippet)
+                for message_proto, (_, _, snippet) in zip(message_protos, page)
+            ]
+            next_cursor = ""
+            if len(rows) > limit:
+                message, rank, _ = page[-1]
+                next_cursor = f"{rank!r}:{message.id}"
+            
+            logger.info(f"SearchMessages successful - user_id: {user_id}, thread_id: {request.thread_id}, hits: {len(hits)}, more: {bool(next_cursor)}")
+            return messaging_pb2.SearchMessagesResponse(hits=hits, next_cursor=next_cursor)
+        
+        except Exception as e:
+            logger.error(f"SearchMessages error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Internal server error: {str(e)}")
+            return messaging_pb2.SearchMessagesResponse()
+    
+    def _decode_search_cursor(self, cursor):
+        # "<rank>:<message id>" of the last hit on the previous page, None if absent or malformed
+        rank, _, message_id = cursor.rpartition(":")
+        try:
+            return float(rank), int(message_id)
+        except ValueError:
+            return None
+    
     def SendMessage(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info(f"SendMessage failed: invalid or expired token - thread_id: {request.thread_id}")
             return messaging_pb2.SendMessageResponse(success=False, message="Invalid token")
@@ -167,51 +638,48 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         user_id = user_info['user_id']
         
         try:
-            db = get_db_session()
-            
-            participant = db.query(ThreadParticipant).filter(
-                ThreadParticipant.user_id == user_id,
-                ThreadParticipant.thread_id == request.thread_id
-            ).first()
-            
-            if not participant:
+            if not self._is_participant(user_id, request.thread_id):
                 logger.info(f"SendMessage failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
                 return messaging_pb2.SendMessageResponse(
                     success=False, 
                     message="You are not a participant in this thread"
                 )
             
-            new_message = Message(
-                content=request.content,
-                sender_id=user_id,
-                thread_id=request.thread_id
-            )
-            db.add(new_message)
-            
-            thread = db.query(Thread).filter(Thread.id == request.thread_id).first()
-            if thread:
-                thread.updated_at = datetime.now(UTC)
-            
-            db.commit()
-            
-            sender = db.query(User).filter(User.id == user_id).first()
-            message_proto = self._message_to_proto(
-                new_message, 
-                sender.username if sender else "Unknown"
-            )
-            
-            db.close()
-            
-            # Broadcast to streaming clients (exclude sender)
-            self._broadcast_message(request.thread_id, message_proto, exclude_sender_id=user_id)
+            if self.write_batcher is not None:
+                # committed and broadcast along with whatever other sends arrive in the same window
+                message_proto = self.write_batcher.submit({
+                    "content": request.content,
+                    "sender_id": user_id,
+                    "thread_id": request.thread_id,
+                    "created_at": utc_now(),
+                })
+            else:
+                sender_username = self.users.username(user_id)
+                new_message = Message(
+                    content=request.content,
+                    sender_id=user_id,
+                    thread_id=request.thread_id,
+                    created_at=utc_now()
+                )
+                
+                with session_scope() as db:
+                    new_message.id = self._insert_message(db, new_message, sender_username)
+                    db.commit()
+                
+                message_proto = self._message_to_proto(new_message, sender_username)
+                # a sender has read everything up to their own message
+                self.read_markers.mark(request.thread_id, user_id, new_message.id)
+                
+                # Broadcast to streaming clients (exclude sender)
+                self._broadcast_message(request.thread_id, message_proto, exclude_sender_id=user_id)
             
-            logger.info(f"SendMessage successful - user_id: {user_id}, thread_id: {request.thread_id}, message_id: {new_message.id}, content_length: {len(request.content)}")
+            logger.info(f"SendMessage successful - user_id: {user_id}, thread_id: {request.thread_id}, message_id: {message_proto.id}, content_length: {len(request.content)}")
             return messaging_pb2.SendMessageResponse(
                 success=True,
                 message="Message sent successfully",
                 sent_message=message_proto
             )
-            
+        
         except Exception as e:
             logger.error(f"SendMessage error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -221,8 +689,96 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
                 message="Internal server error"
             )
     
+    def SendMessages(self, request_iterator, context):
+        call = SendMessagesCall(context)
+        
+        try:
+            for request in request_iterator:
+                rejected = call.add(request)
+                if rejected:
+                    return rejected
+                
+                batch = call.take_batch()
+                if batch:
+                    call.sent(self._send_message_batch(*batch))
+            
+            batch = call.take_batch(final=True)
+            if batch:
+                call.sent(self._send_message_batch(*batch))
+            
+            return call.response()
+        
+        except Exception as e:
+            return call.error_response(e)
+    
+    def _send_message_batch(self, user_id, requests):
+        # Sends one batch of a SendMessages stream in a single transaction and
+        # broadcasts it in order. Returns a SendMessagesResult per request
+        results = [None] * len(requests)
+        indexes = []
+        rows = []
+        created_at = utc_now()
+        for index, request in enumerate(requests):
+            if not self._is_participant(user_id, request.thread_id):
+                results[index] = messaging_pb2.SendMessagesResult(error="You are not a participant in this thread")
+                continue
+            indexes.append(index)
+            rows.append({
+                "content": request.content,
+                "sender_id": user_id,
+                "thread_id": request.thread_id,
+                "created_at": created_at,
+            })
+        
+        if not rows:
+            return results
+        
+        try:
+            message_protos = self._commit_messages(rows)
+        except Exception as e:
+            logger.error(f"SendMessages batch failed - user_id: {user_id}, messages: {len(rows)}, error: {str(e)}")
+            for index in indexes:
+                results[index] = messaging_pb2.SendMessagesResult(error="Internal server error")
+            return results
+        
+        for index, message_proto in zip(indexes, message_protos):
+            results[index] = messaging_pb2.SendMessagesResult(message_id=message_proto.id)
+        return results
+    
+    def _commit_messages(self, rows):
+        # Writes message column dicts in one transaction, then broadcasts them in order.
+        # Returns their protos, built straight from the rows since a batch can be
+        # thousands of messages. Used by SendMessages and the SendMessage write batcher
+        sender_ids = {row["sender_id"] for row in rows}
+        senders = self.users.get_many(sender_ids)
+        sender_usernames = {
+            sender_id: senders[sender_id].username if sender_id in senders else "Unknown"
+            for sender_id in sender_ids
+        }
+        
+        with session_scope() as db:
+            message_ids = self._insert_messages(db, rows, sender_usernames)
+            db.commit()
+        
+        message_protos = [
+            messaging_pb2.Message(
+                id=message_id,
+                content=row["content"],
+                sender_id=row["sender_id"],
+                sender_username=sender_usernames[row["sender_id"]],
+                created_at=to_timestamp(row["created_at"]),
+                thread_id=row["thread_id"]
+            )
+            for row, message_id in zip(rows, message_ids)
+        ]
+        # a sender has read everything up to their own message
+        for message_proto in message_protos:
+            self.read_markers.mark(message_proto.thread_id, message_proto.sender_id, message_proto.id)
+        self._broadcast_messages(message_protos)
+        return message_protos
+    
     def CreateThread(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info(f"CreateThread failed: invalid or expired token - participants: {request.participant_usernames}")
             return messaging_pb2.CreateThreadResponse(success=False, message="Invalid token")
@@ -230,64 +786,79 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         user_id = user_info['user_id']
         
         try:
-            db = get_db_session()
-
-            participant_users = db.query(User).filter(
-                User.username.in_(request.participant_usernames)
-            ).all()
-            
-            if len(participant_users) != len(request.participant_usernames):
-                logger.info(f"CreateThread failed: users not found - user_id: {user_id}, participants: {request.participant_usernames}")
-                return messaging_pb2.CreateThreadResponse(
-                    success=False,
-                    message="One or more users not found"
-                )
-            
-            current_user = db.query(User).filter(User.id == user_id).first()
-            if current_user not in participant_users:
-                participant_users.append(current_user)
-            
-            is_dm = len(participant_users) == 2 and not request.name
-            
-            if is_dm:
-                user_ids = sorted([user.id for user in participant_users])
-                existing_thread = self._find_existing_dm_thread(db, user_ids[0], user_ids[1])
+            with session_scope() as db:
+                # messaging_pb2.User per participant, ids and usernames are all a thread proto needs
+                participant_users = [
+                    messaging_pb2.User(id=participant_id, username=username)
+                    for participant_id, username in db.query(User.id, User.username).filter(
+                        User.username.in_(request.participant_usernames)
+                    )
+                ]
+                current_user = self.users.get(user_id)
                 
-                if existing_thread:
-                    thread_proto = self._thread_to_proto(existing_thread, db)
-                    db.close()
-
-                    logger.info(f"CreateThread found existing DM - user_id: {user_id}, thread_id: {existing_thread.id}, participants: {[u.username for u in participant_users]}")
+                if len(participant_users) != len(request.participant_usernames) or current_user is None:
+                    logger.info(f"CreateThread failed: users not found - user_id: {user_id}, participants: {request.participant_usernames}")
                     return messaging_pb2.CreateThreadResponse(
-                        success=True,
-                        message="Found existing conversation",
-                        thread=thread_proto
+                        success=False,
+                        message="One or more users not found"
                     )
+                
+                if user_id not in {user.id for user in participant_users}:
+                    participant_users.append(current_user)
+                
+                is_dm = len(participant_users) == 2 and not request.name
+                dm_user_ids = sorted(user.id for user in participant_users) if is_dm else [None, None]
+                
+                if is_dm:
+                    existing_thread = self._find_existing_dm_thread(db, *dm_user_ids)
+                    if existing_thread:
+                        return self._existing_dm_response(db, existing_thread, user_id, participant_users)
+                
+                participant_ids = [user.id for user in participant_users]
+                participant_usernames = [user.username for user in participant_users]
+                created_at = utc_now()
+                
+                # one transaction, the thread row and then every participant in a multi-row
+                # insert, so a failure leaves nothing half created and a DM key never points
+                # at a thread that is missing its participants
+                try:
+                    thread_id = db.execute(insert(Thread.__table__).values(
+                        name=request.name if request.name else None,
+                        created_at=created_at,
+                        updated_at=created_at,
+                        dm_min_user_id=dm_user_ids[0],
+                        dm_max_user_id=dm_user_ids[1]
+                    )).inserted_primary_key[0]
+                    db.execute(insert(ThreadParticipant.__table__), [
+                        {"thread_id": thread_id, "user_id": participant_id, "joined_at": created_at}
+                        for participant_id in participant_ids
+                    ])
+                    db.commit()
+                except IntegrityError:
+                    # a concurrent CreateThread for the same pair won the unique index, use its thread
+                    db.rollback()
+                    existing_thread = self._find_existing_dm_thread(db, *dm_user_ids) if is_dm else None
+                    if existing_thread is None:
+                        raise
+                    return self._existing_dm_response(db, existing_thread, user_id, participant_users)
             
-            new_thread = Thread(name=request.name if request.name else None)
-            db.add(new_thread)
-            db.commit()
-            
-            for user in participant_users:
-                participant = ThreadParticipant(
-                    thread_id=new_thread.id,
-                    user_id=user.id
-                )
-                db.add(participant)
-            
-            db.commit()
-            
-            thread_proto = self._thread_to_proto(new_thread, db)
+            # built from what was just written, a new thread has no messages to load
+            thread_proto = messaging_pb2.Thread(
+                id=thread_id,
+                name=request.name,
+                participants=participant_users,
+                updated_at=to_timestamp(created_at)
+            )
             
-            db.close()
+            self._broadcast_thread(thread_proto, participant_ids, created=True)
             
-            logger.info(f"CreateThread successful - user_id: {user_id}, thread_id: {new_thread.id}, participants: {[u.username for u in participant_users]}, name: {request.name}")
+            logger.info(f"CreateThread successful - user_id: {user_id}, thread_id: {thread_proto.id}, participants: {participant_usernames}, name: {request.name}")
             return messaging_pb2.CreateThreadResponse(
                 success=True,
                 message="Thread created successfully",
                 thread=thread_proto
             )
-            
+        
         except Exception as e:
             logger.error(f"CreateThread error - user_id: {user_id}, participants: {request.participant_usernames}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -298,7 +869,7 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
             )
     
     def JoinThread(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info(f"JoinThread failed: invalid or expired token - thread_id: {request.thread_id}")
             return messaging_pb2.JoinThreadResponse(success=False, message="Invalid token")
@@ -306,30 +877,20 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         user_id = user_info['user_id']
         
         try:
-            db = get_db_session()
-
             # Check if user is a participant in this thread
-            participant = db.query(ThreadParticipant).filter(
-                ThreadParticipant.user_id == user_id,
-                ThreadParticipant.thread_id == request.thread_id
-            ).first()
-            
-            if not participant:
+            if not self._is_participant(user_id, request.thread_id):
                 logger.info(f"JoinThread failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
-                db.close()
                 return messaging_pb2.JoinThreadResponse(
                     success=False, 
                     message="You are not a participant in this thread"
                 )
             
-            db.close()
-            
             logger.info(f"JoinThread successful - user_id: {user_id}, thread_id: {request.thread_id}")
             return messaging_pb2.JoinThreadResponse(
                 success=True,
                 message="Successfully joined thread for streaming"
             )
-            
+        
         except Exception as e:
             logger.error(f"JoinThread error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
             context.set_code(grpc.StatusCode.INTERNAL)
@@ -339,8 +900,43 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
                 message="Internal server error"
             )
     
+    def MarkRead(self, request, context):
+        user_info = authenticate(request, context)
+        if not user_info:
+            logger.info(f"MarkRead failed: invalid or expired token - thread_id: {request.thread_id}")
+            return messaging_pb2.MarkReadResponse(success=False, message="Invalid token")
+        
+        user_id = user_info['user_id']
+        
+        try:
+            if not self._is_participant(user_id, request.thread_id):
+                logger.info(f"MarkRead failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
+                return messaging_pb2.MarkReadResponse(
+                    success=False,
+                    message="You are not a participant in this thread"
+                )
+            
+            if request.message_id <= 0:
+                return messaging_pb2.MarkReadResponse(success=False, message="message_id is required")
+            
+            # recorded in memory and written by the next flush
+            self.read_markers.mark(request.thread_id, user_id, request.message_id)
+            
+            # clients call this on every scroll, so it is only logged at debug level
+            logger.debug(f"MarkRead successful - user_id: {user_id}, thread_id: {request.thread_id}, message_id: {request.message_id}")
+            return messaging_pb2.MarkReadResponse(success=True, message="Marked as read")
+        
+        except Exception as e:
+            logger.error(f"MarkRead error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
+            context.set_code(grpc.StatusCode.INTERNAL)
+            context.set_details(f"Internal server error: {str(e)}")
+            return messaging_pb2.MarkReadResponse(
+                success=False,
+                message="Internal server error"
+            )
+    
     def LeaveThread(self, request, context):
-        user_info = validate_jwt_token(request.token, context)
+        user_info = authenticate(request, context)
         if not user_info:
             logger.info(f"LeaveThread failed: invalid or expired token - thread_id: {request.thread_id}")
             return messaging_pb2.LeaveThreadResponse(success=False, message="Invalid token")
@@ -353,89 +949,282 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
         )
     
     def StreamThreadMessages(self, request, context):
-        import queue
+        call = ThreadStreamCall(self, request)
+        if not call.authenticate(context):
+            return
         
-        user_info = validate_jwt_token(request.token, context)
-        if not user_info:
-            logger.info(f"StreamThreadMessages failed: invalid or expired token - thread_id: {request.thread_id}")
+        error = call.check()
+        if error:
+            yield error
             return
         
-        user_id = user_info['user_id']
+        subscription = Subscription(call.user_id, last_message_id=call.resume_from)
+        # wakes the loop below as soon as the client goes away. False means the call
+        # already ended (say while check ran), the callback would never fire
+        if not context.add_callback(subscription.close):
+            logger.info(f"StreamThreadMessages ended before subscribing - user_id: {call.user_id}, thread_id: {call.thread_id}")
+            return
         
         try:
-            db = get_db_session()
+            yield call.subscribe(subscription)
+            yield from call.replay()
             
-            participant = db.query(ThreadParticipant).filter(
-                ThreadParticipant.user_id == user_id,
-                ThreadParticipant.thread_id == request.thread_id
-            ).first()
+            while True:
+                response = subscription.get()
+                if response is None:
+                    break
+                yield call.frame(response)
+        
+        finally:
+            call.close()
+        
+        # outside any try, the sync server's abort raises a plain Exception
+        details = call.overflow_details()
+        if details:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, details)
+    
+    def StreamUserEvents(self, request, context):
+        call = UserStreamCall(self, request)
+        if not call.authenticate(context):
+            return
+        
+        subscription = Subscription(call.user_id)
+        if not context.add_callback(subscription.close):
+            logger.info(f"StreamUserEvents ended before subscribing - user_id: {call.user_id}")
+            return
+        
+        try:
+            yield call.subscribe(subscription)
             
-            if not participant:
-                logger.info(f"StreamThreadMessages failed: permission denied - user_id: {user_id}, thread_id: {request.thread_id}")
-                db.close()
-                yield messaging_pb2.MessageStreamResponse(error="You are not a participant in this thread")
+            while True:
+                event = subscription.get()
+                if event is None:
+                    break
+                yield call.frame(event)
+        
+        finally:
+            call.close()
+        
+        details = call.overflow_details()
+        if details:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, details)
+    
+    def _is_participant(self, user_id, thread_id):
+        return self.membership.is_member(user_id, thread_id)
+    
+    def _subscribe(self, thread_id, subscription):
+        with self.lock:
+            if thread_id not in self.subscribers:
+                self.subscribers[thread_id] = []
+            self.subscribers[thread_id].append(subscription)
+    
+    def _unsubscribe(self, thread_id, subscription):
+        with self.lock:
+            if thread_id in self.subscribers:
+                self.subscribers[thread_id] = [
+                    subscriber for subscriber in self.subscribers[thread_id]
+                    if subscriber is not subscription
+                ]
+                if not self.subscribers[thread_id]:
+                    del self.subscribers[thread_id]
+    
+    def _thread_member_ids(self, thread_id):
+        return self.membership.members(thread_id)
+    
+    def _load_thread_member_ids(self, thread_id):
+        with session_scope() as db:
+            return [
+                user_id for (user_id,) in db.query(ThreadParticipant.user_id).filter(
+                    ThreadParticipant.thread_id == thread_id
+                )
+            ]
+    
+    def _subscribe_user(self, subscription):
+        with self.lock:
+            self.user_subscribers.setdefault(subscription.user_id, []).append(subscription)
+    
+    def _unsubscribe_user(self, subscription):
+        with self.lock:
+            subscriptions = [
+                subscriber for subscriber in self.user_subscribers.get(subscription.user_id, [])
+                if subscriber is not subscription
+            ]
+            if subscriptions:
+                self.user_subscribers[subscription.user_id] = subscriptions
+            else:
+                self.user_subscribers.pop(subscription.user_id, None)
+    
+    def _deliver_to_users(self, user_ids, frame, exclude_user_id=None):
+        # routes through the user -> streams index, so the cost is bounded by the
+        # recipients rather than by how many threads they have open
+        with self.lock:
+            for user_id in user_ids:
+                if exclude_user_id and user_id == exclude_user_id:
+                    continue
+                
+                subscriptions = self.user_subscribers.get(user_id)
+                if not subscriptions:
+                    continue
+                
+                active_subscribers = [subscription for subscription in subscriptions if subscription.put(frame)]
+                if active_subscribers:
+                    self.user_subscribers[user_id] = active_subscribers
+                else:
+                    del self.user_subscribers[user_id]
+    
+    def _broadcast_thread(self, thread_proto, participant_ids, created=False):
+        # the membership event is tiny so it always fits in a NOTIFY, even when the
+        # thread event has to drop its payload
+        self.bus.publish("membership", thread_id=thread_proto.id)
+        self.bus.publish(
+            "thread",
+            thread_id=thread_proto.id,
+            thread=thread_proto.SerializeToString(),
+            participant_ids=participant_ids,
+            created=created
+        )
+    
+    def _load_thread_proto(self, thread_id):
+        with session_scope() as db:
+            thread = db.query(Thread).filter(Thread.id == thread_id).first()
+            return self._thread_to_proto(thread, db) if thread else None
+    
+    def _deliver_membership(self, thread_id):
+        # published for every membership change, so every replica drops its cached
+        # members here, whether or not anyone is streaming
+        self.membership.invalidate(thread_id)
+    
+    def _deliver_thread(self, thread_id, thread, participant_ids, created=False):
+        with self.lock:
+            if not self.user_subscribers:
                 return
-            
-            db.close()
-            
-            response_queue = queue.Queue()
-            thread_id = request.thread_id
-            
-            with self.lock:
-                if thread_id not in self.subscribers:
-                    self.subscribers[thread_id] = []
-                self.subscribers[thread_id].append((user_id, response_queue))
-            
-            yield messaging_pb2.MessageStreamResponse(
-                status=messaging_pb2.ConnectionStatus(connected=True, message="Connected to thread stream")
+        
+        # thread and participant_ids are None when the bus had to drop an oversized payload
+        if participant_ids is None:
+            participant_ids = self._load_thread_member_ids(thread_id)
+        if thread is None:
+            thread_proto = self._load_thread_proto(thread_id)
+            if thread_proto is None:
+                return
+        else:
+            thread_proto = messaging_pb2.Thread.FromString(thread)
+        
+        if created:
+            event = messaging_pb2.UserEvent(thread_created=thread_proto)
+        else:
+            event = messaging_pb2.UserEvent(thread_updated=thread_proto)
+        
+        self._deliver_to_users(participant_ids, event.SerializeToString())
+    
+    def _deliver_user(self, user_id):
+        # published by anything that renames a user
+        self.users.invalidate(user_id)
+    
+    def _resync(self):
+        # the bus may have lost messages, so the ring and cached pages kept current
+        # from them are dropped and rebuilt from the database as they are used
+        logger.info("Broadcast resync - dropping replay rings and cached message pages")
+        self.replay.clear()
+        if self.recent_messages:
+            self.recent_messages.clear()
+    
+    def _broadcast_message(self, thread_id, message_proto, exclude_sender_id=None):
+        self.bus.publish(
+            "message",
+            thread_id=thread_id,
+            message_id=message_proto.id,
+            message=message_proto.SerializeToString(),
+            exclude_sender_id=exclude_sender_id
+        )
+    
+    def _broadcast_messages(self, message_protos):
+        # same events as _broadcast_message, published together in order, each one
+        # skipping its own sender
+        self.bus.publish_many("message", [
+            {
+                "thread_id": message_proto.thread_id,
+                "message_id": message_proto.id,
+                "message": message_proto.SerializeToString(),
+                "exclude_sender_id": message_proto.sender_id,
+            }
+            for message_proto in message_protos
+        ])
+    
+    def _load_message_proto(self, message_id):
+        with session_scope() as db:
+            message = db.query(Message).filter(Message.id == message_id).first()
+            if not message:
+                return None
+            return self._messages_to_protos([message])[0]
+    
+    def _thread_last_message_id(self, thread_id):
+        # where a new stream starts, read before subscribing so that a resume from it
+        # can't skip anything the stream buffers
+        with session_scope() as db:
+            return db.query(Thread.last_message_id).filter(Thread.id == thread_id).scalar() or 0
+    
+    def _replay_frames(self, thread_id, last_seen_message_id):
+        # Frames for messages after last_seen_message_id, from the replay ring when it reaches
+        # back far enough, otherwise from the database. Returns the frames, the ids of the
+        # messages they carry and the newest id covered
+        entries = self.replay.since(thread_id, last_seen_message_id)
+        if entries is not None:
+            metrics.incr("stream.replay_ring_hits")
+            if not entries:
+                return [], [], last_seen_message_id
+            return [frame for _, frame in entries], [message_id for message_id, _ in entries], entries[-1][0]
+        
+        metrics.incr("stream.replay_db_fallbacks")
+        with session_scope() as db:
+            query = db.query(Message).filter(
+                Message.thread_id == thread_id,
+                Message.id > last_seen_message_id
             )
+            messages = query.order_by(Message.id.asc()).limit(REPLAY_MAX_MESSAGES + 1).all()
             
-            logger.info(f"StreamThreadMessages started - user_id: {user_id}, thread_id: {thread_id}")
-            
-            try:
-                while context.is_active():
-                    try:
-                        response = response_queue.get(timeout=1)
-                        yield response
-                    except queue.Empty:
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error in StreamThreadMessages response: {str(e)}")
-                        break
+            if len(messages) > REPLAY_MAX_MESSAGES:
+                # too far behind to replay, the client refetches with GetMessages instead
+                newest_id = db.query(func.max(Message.id)).filter(Message.thread_id == thread_id).scalar()
+                missed_ids = query.with_entities(Message.id).limit(MISSED_COUNT_CAP).subquery()
+                missed = messaging_pb2.MissedMessages(count=db.query(func.count()).select_from(missed_ids).scalar())
+                return [messaging_pb2.MessageStreamResponse(missed=missed)], [], newest_id
             
-            finally:
-                with self.lock:
-                    if thread_id in self.subscribers:
-                        # Remove the (user_id, response_queue) tuple
-                        self.subscribers[thread_id] = [
-                            (uid, queue) for uid, queue in self.subscribers[thread_id] 
-                            if queue != response_queue
-                        ]
-                        if not self.subscribers[thread_id]:
-                            del self.subscribers[thread_id]
-                
-                logger.info(f"StreamThreadMessages ended - user_id: {user_id}, thread_id: {thread_id}")
-        
-        except Exception as e:
-            logger.error(f"StreamThreadMessages error - user_id: {user_id}, thread_id: {request.thread_id}, error: {str(e)}")
-            yield messaging_pb2.MessageStreamResponse(error=f"Internal server error: {str(e)}")
+            frames = [
+                messaging_pb2.MessageStreamResponse(new_message=message_proto).SerializeToString()
+                for message_proto in self._messages_to_protos(messages)
+            ]
+            return frames, [message.id for message in messages], messages[-1].id if messages else last_seen_message_id
     
-    def _broadcast_message(self, thread_id, message_proto, exclude_sender_id=None):
+    def _deliver_message(self, thread_id, message_id, message, exclude_sender_id=None):
+        # message is None when the bus had to drop an oversized payload
+        if message is None:
+            message_proto = self._load_message_proto(message_id)
+            if message_proto is None:
+                return
+        else:
+            message_proto = messaging_pb2.Message.FromString(message)
+        
+        # encoded once here, every subscriber's stream sends these same bytes as-is,
+        # and kept in the replay ring even when nobody is watching the thread right now
+        frame = messaging_pb2.MessageStreamResponse(new_message=message_proto).SerializeToString()
+        self.replay.append(thread_id, message_proto.id, frame)
+        if self.recent_messages:
+            self.recent_messages.append(thread_id, message_proto)
+        
         with self.lock:
+            has_user_subscribers = bool(self.user_subscribers)
+            
             if thread_id in self.subscribers:
-                response = messaging_pb2.MessageStreamResponse(new_message=message_proto)
-                
                 active_subscribers = []
-                for user_id, subscriber_queue in self.subscribers[thread_id]:
+                for subscription in self.subscribers[thread_id]:
                     # don't send to sender
-                    if exclude_sender_id and user_id == exclude_sender_id:
-                        active_subscribers.append((user_id, subscriber_queue))
+                    if exclude_sender_id and subscription.user_id == exclude_sender_id:
+                        active_subscribers.append(subscription)
                         continue
-                        
-                    try:
-                        subscriber_queue.put(response)
-                        active_subscribers.append((user_id, subscriber_queue))
-                    except:
+                    
+                    if subscription.put(frame, message_proto.id):
+                        active_subscribers.append(subscription)
+                    else:
                         logger.info(f"Removed disconnected subscriber from thread {thread_id}")
                 
                 if active_subscribers:
@@ -443,4 +1232,8 @@ class MessagingService(messaging_pb2_grpc.MessagingServiceServicer):
                 else:
                     del self.subscribers[thread_id]
                     logger.info(f"No active subscribers left for thread {thread_id}")
+        
+        if has_user_subscribers:
+            event = messaging_pb2.UserEvent(new_message=message_proto).SerializeToString()
+            self._deliver_to_users(self._thread_member_ids(thread_id), event, exclude_user_id=exclude_sender_id)
     
@@ -0,0 +1,111 @@
+"""Coalesced read markers.
+
+Clients call MarkRead as messages scroll into view, often several times a
+second per user. Each call only records the highest message id seen per
+(thread, user) in memory, and a flusher thread writes everything pending every
+READ_MARKER_FLUSH_SECONDS in one executemany UPDATE. Markers only move forward,
+both here and in the UPDATE, and the UPDATE caps them at the thread's newest
+message so a bogus id can't hide messages that haven't been sent yet.
+
+Pending markers are on this replica only. GetThreads flushes the caller's
+markers before reading them, so a user always sees their own reads, though
+another replica can be up to one flush interval behind. Flushes run one at a
+time from taking the markers to the commit, so a caller's flush waits for a
+background one that already took their markers. Markers still pending
+when the process dies are lost, which only costs an unread badge.
+"""
+import logging
+import os
+import threading
+
+from sqlalchemy import bindparam, case, func, or_, select, update
+
+from messenger.config.database import session_scope
+from messenger.models.thread import Thread, ThreadParticipant
+from messenger.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+READ_MARKER_FLUSH_SECONDS = float(os.getenv("READ_MARKER_FLUSH_SECONDS", "1"))
+
+class ReadMarkers:
+    def __init__(self, flush_seconds=None):
+        self.flush_seconds = flush_seconds or READ_MARKER_FLUSH_SECONDS
+        # (thread_id, user_id) -> highest message id marked read since the last flush
+        self._pending = {}
+        self._lock = threading.Lock()
+        # held by a flush from taking markers until they are written or put back
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flusher = threading.Thread(target=self._run, name="read-marker-flusher", daemon=True)
+        self._flusher.start()
+        
+        metrics.gauge("read_markers.pending", lambda: len(self._pending))
+    
+    def mark(self, thread_id, user_id, message_id):
+        metrics.incr("read_markers.marks")
+        with self._lock:
+            key = (thread_id, user_id)
+            if message_id > self._pending.get(key, 0):
+                self._pending[key] = message_id
+    
+    def flush(self, user_id=None):
+        # writes pending markers, only user_id's when given
+        with self._flush_lock:
+            self._flush(user_id)
+    
+    def _flush(self, user_id):
+        # called with the flush lock held
+        with self._lock:
+            if user_id is None:
+                markers, self._pending = self._pending, {}
+            else:
+                markers = {key: value for key, value in self._pending.items() if key[1] == user_id}
+                for key in markers:
+                    del self._pending[key]
+        
+        if not markers:
+            return
+        
+        newest_id = func.coalesce(
+            select(Thread.last_message_id).where(Thread.id == ThreadParticipant.thread_id).scalar_subquery(), 0
+        )
+        marker = case((bindparam("message_id_") < newest_id, bindparam("message_id_")), else_=newest_id)
+        
+        try:
+            with session_scope() as db:
+                db.execute(
+                    update(ThreadParticipant.__table__).where(
+                        ThreadParticipant.thread_id == bindparam("thread_id_"),
+                        ThreadParticipant.user_id == bindparam("user_id_"),
+                        or_(
+                            ThreadParticipant.last_read_message_id.is_(None),
+                            ThreadParticipant.last_read_message_id < marker
+                        )
+                    ).values(last_read_message_id=marker),
+                    [
+                        {"thread_id_": thread_id, "user_id_": marker_user_id, "message_id_": message_id}
+                        for (thread_id, marker_user_id), message_id in markers.items()
+                    ]
+                )
+                db.commit()
+        except Exception:
+            # keep them for the next flush, merged with anything marked meanwhile
+            with self._lock:
+                for key, message_id in markers.items():
+                    if message_id > self._pending.get(key, 0):
+                        self._pending[key] = message_id
+            raise
+        
+        metrics.incr("read_markers.writes", len(markers))
+    
+    def stop(self):
+        self._stopping.set()
+        self.flush()
+    
+    def _run(self):
+        while not self._stopping.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Read marker flush failed - error: {str(e)}")
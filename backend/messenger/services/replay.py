@@ -0,0 +1,50 @@
+"""Recent-message ring buffers for resuming thread streams.
+
+Every message delivered on this replica is kept, already encoded as a
+MessageStreamResponse frame, in a small per-thread ring. A client that
+reconnects with last_seen_message_id can be caught up from memory when the
+ring still reaches back that far. Otherwise the caller falls back to a
+database range query.
+
+Only the most recently active REPLAY_BUFFER_THREADS threads keep a ring.
+Rings are dropped when the broadcast bus may have lost messages, since a
+ring missing one would still claim to cover its range.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+
+REPLAY_BUFFER_SIZE = int(os.getenv("REPLAY_BUFFER_SIZE", "100"))
+REPLAY_BUFFER_THREADS = int(os.getenv("REPLAY_BUFFER_THREADS", "1000"))
+
+class ReplayBuffer:
+    def __init__(self, size=None, max_threads=None):
+        self.size = size or REPLAY_BUFFER_SIZE
+        self.max_threads = max_threads or REPLAY_BUFFER_THREADS
+        self._rings = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def append(self, thread_id, message_id, frame):
+        with self._lock:
+            ring = self._rings.get(thread_id)
+            if ring is None:
+                ring = self._rings[thread_id] = deque(maxlen=self.size)
+                if len(self._rings) > self.max_threads:
+                    self._rings.popitem(last=False)
+            else:
+                self._rings.move_to_end(thread_id)
+            ring.append((message_id, frame))
+    
+    def since(self, thread_id, last_seen_message_id):
+        # (message_id, frame) pairs newer than last_seen_message_id in id order,
+        # or None when the ring doesn't reach back far enough to be sure nothing is missing
+        with self._lock:
+            ring = self._rings.get(thread_id)
+            if not ring or min(message_id for message_id, _ in ring) > last_seen_message_id:
+                return None
+            entries = [(message_id, frame) for message_id, frame in ring if message_id > last_seen_message_id]
+        return sorted(entries, key=lambda entry: entry[0])
+    
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
@@ -0,0 +1,125 @@
+"""Full-text search over message content.
+
+SearchMessages only talks to a SearchBackend. On postgres that is a stored
+tsvector column generated from content, behind a GIN index. On sqlite (local
+development) it is an FTS5 table that triggers keep in sync with messages.
+Either way the index follows every insert by itself, so none of the write
+paths know about search. create_index sets the backend up and is run by
+migrate_db.py.
+
+Hits come back best first, ordered by (rank, message id) descending and paged
+by keyset on that pair. Matched terms in snippets are wrapped in SNIPPET_MARK.
+"""
+from sqlalchemy import Double, and_, cast, column, func, literal_column, or_, select, table, text
+
+from messenger.config.database import engine
+from messenger.models.message import Message
+from messenger.models.thread import ThreadParticipant
+
+SNIPPET_MARK = "**"
+# postgres text search configuration, changing it means regenerating the column
+SEARCH_CONFIG = "english"
+
+class SearchBackend:
+    def create_index(self):
+        # idempotent, builds the index for any existing messages the first time
+        raise NotImplementedError
+    
+    def search(self, db, user_id, query, thread_id, limit, after):
+        # [(Message, rank, snippet)] matching query in user_id's threads, or only in
+        # thread_id when set. after is the (rank, message_id) of the last hit of the
+        # previous page, None for the first page
+        raise NotImplementedError
+    
+    def _scope(self, statement, user_id, thread_id):
+        if thread_id:
+            return statement.where(Message.thread_id == thread_id)
+        return statement.join(ThreadParticipant, and_(
+            ThreadParticipant.thread_id == Message.thread_id,
+            ThreadParticipant.user_id == user_id
+        ))
+    
+    def _after(self, statement, rank, after):
+        if after is None:
+            return statement
+        after_rank, after_id = after
+        return statement.where(or_(rank < after_rank, and_(rank == after_rank, Message.id < after_id)))
+
+class PostgresSearch(SearchBackend):
+    def create_index(self):
+        with engine.begin() as conn:
+            # rewrites the table once when the column is first added
+            conn.execute(text(
+                "ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', content)) STORED"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_message_search ON messages USING GIN (search_vector)"))
+    
+    def search(self, db, user_id, query, thread_id, limit, after):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        # double precision so the rank survives the round trip through a cursor exactly
+        rank = cast(func.ts_rank(literal_column("messages.search_vector"), tsquery), Double)
+        
+        statement = select(Message.id.label("message_id"), rank.label("rank")).where(
+            literal_column("messages.search_vector").op("@@")(tsquery)
+        )
+        statement = self._after(self._scope(statement, user_id, thread_id), rank, after)
+        page = statement.order_by(rank.desc(), Message.id.desc()).limit(limit).subquery()
+        
+        # headlines are expensive, so only for the page itself
+        snippet = func.ts_headline(
+            SEARCH_CONFIG, Message.content, tsquery,
+            f'StartSel="{SNIPPET_MARK}", StopSel="{SNIPPET_MARK}", MaxWords=24, MinWords=8'
+        )
+        return db.query(Message, page.c.rank, snippet).join(
+            page, page.c.message_id == Message.id
+        ).order_by(page.c.rank.desc(), Message.id.desc()).all()
+
+class SqliteSearch(SearchBackend):
+    TRIGGERS = (
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN "
+        "INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content); END",
+    )
+    
+    def create_index(self):
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            )).first()
+            if not exists:
+                # porter stemming, close to the postgres english configuration though
+                # not identical (deployment and deploy stem differently here)
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE messages_fts USING fts5("
+                    "content, content='messages', content_rowid='id', tokenize='porter unicode61')"
+                ))
+                conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+            for trigger in self.TRIGGERS:
+                conn.execute(text(trigger))
+    
+    def search(self, db, user_id, query, thread_id, limit, after):
+        fts_table = table("messages_fts", column("rowid"))
+        fts = literal_column("messages_fts")
+        # bm25 is lower for better matches
+        rank = -func.bm25(fts)
+        snippet = func.snippet(fts, 0, SNIPPET_MARK, SNIPPET_MARK, "...", 16)
+        
+        statement = select(Message, rank.label("rank"), snippet.label("snippet")).select_from(
+            fts_table.join(Message, Message.id == fts_table.c.rowid)
+        ).where(fts.op("MATCH")(self._match_expression(query)))
+        statement = self._after(self._scope(statement, user_id, thread_id), rank, after)
+        return db.execute(statement.order_by(rank.desc(), Message.id.desc()).limit(limit)).all()
+    
+    def _match_expression(self, query):
+        # every word as a quoted term, so user input can't be FTS5 query syntax
+        return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def create_search_backend():
+    if engine.dialect.name == "postgresql":
+        return PostgresSearch()
+    return SqliteSearch()
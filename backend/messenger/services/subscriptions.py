@@ -0,0 +1,154 @@
+"""Per-stream delivery buffers.
+
+A reader is only woken when a frame is put or the stream is closed, so an
+idle stream costs nothing between messages and a disconnect (delivered via
+context.add_callback) ends the stream immediately instead of on the next poll.
+
+Buffers are bounded at STREAM_BUFFER_SIZE frames. When a slow reader fills its
+buffer, STREAM_OVERFLOW_POLICY decides what happens:
+
+- drop_oldest: discard the oldest buffered frame
+- coalesce: discard everything buffered and deliver one MissedMessages
+  marker in its place, so the client knows to refetch
+- disconnect: close the stream, the handler ends it with RESOURCE_EXHAUSTED
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+
+from messenger.generated import messaging_pb2
+from messenger.utils.metrics import metrics
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "256"))
+STREAM_OVERFLOW_POLICY = os.getenv("STREAM_OVERFLOW_POLICY", COALESCE)
+
+# stands in for the dropped frames until the reader collects it
+_MISSED = object()
+
+class Subscription:
+    def __init__(self, user_id, max_size=None, overflow_policy=None, last_message_id=0):
+        self.user_id = user_id
+        self.max_size = max_size or STREAM_BUFFER_SIZE
+        self.overflow_policy = overflow_policy or STREAM_OVERFLOW_POLICY
+        self.closed = False
+        self.overflowed = False
+        self.dropped = 0
+        # id of the newest message handed to the reader, clients resume from it. Starts
+        # at wherever the stream started, so an overflow before the first frame resumes there
+        self.last_message_id = last_message_id
+        self._replayed = set()
+        self._missed = 0
+        self._items = deque()
+        self._condition = threading.Condition()
+    
+    @property
+    def depth(self):
+        return len(self._items)
+    
+    def put(self, item, message_id=None):
+        with self._condition:
+            if self.closed:
+                return False
+            if len(self._items) >= self.max_size and not self._overflow():
+                return False
+            self._items.append((message_id, item))
+            self._wake()
+        return True
+    
+    def replayed(self, message_ids, last_message_id):
+        # A replay already sent message_ids, so their live copies are dropped. Any other
+        # frame still comes through, including one with a lower id that was committed
+        # or relayed late. last_message_id is where the replay left the client
+        with self._condition:
+            self._replayed.update(message_ids)
+            self.last_message_id = max(self.last_message_id, last_message_id)
+    
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._wake()
+    
+    def get(self):
+        # Blocks until a frame is available, returns None once the stream is closed.
+        # Frames are returned as put, except the overflow marker which comes back
+        # as a MissedMessages proto for the handler to wrap in its response type
+        with self._condition:
+            while True:
+                item = self._pop()
+                if item is not None or self.closed:
+                    return item
+                self._condition.wait()
+    
+    def _pop(self):
+        # called with the condition held
+        while self._items and not self.overflowed:
+            entry = self._items.popleft()
+            if entry is _MISSED:
+                missed = messaging_pb2.MissedMessages(count=self._missed)
+                self._missed = 0
+                return missed
+            
+            message_id, item = entry
+            if message_id is not None:
+                if message_id in self._replayed:
+                    self._replayed.discard(message_id)
+                    continue
+                self.last_message_id = max(self.last_message_id, message_id)
+            return item
+        return None
+    
+    def _overflow(self):
+        # called with the condition held, returns False if the new frame should be refused
+        if self.overflow_policy == DROP_OLDEST:
+            self._items.popleft()
+            self._record_drops(1)
+            return True
+        
+        if self.overflow_policy == COALESCE:
+            dropped = sum(1 for item in self._items if item is not _MISSED)
+            self._items.clear()
+            self._items.append(_MISSED)
+            self._missed += dropped
+            self._record_drops(dropped)
+            return True
+        
+        self.overflowed = True
+        self.closed = True
+        self._record_drops(1)
+        metrics.incr("stream.overflow_disconnects")
+        self._wake()
+        return False
+    
+    def _record_drops(self, count):
+        self.dropped += count
+        metrics.incr("stream.dropped_frames", count)
+    
+    def _wake(self):
+        # called with the condition held
+        self._condition.notify()
+
+class AsyncSubscription(Subscription):
+    # Same buffer, but the reader is a coroutine on loop and puts may come from any thread
+    def __init__(self, user_id, loop, max_size=None, overflow_policy=None, last_message_id=0):
+        super().__init__(user_id, max_size, overflow_policy, last_message_id)
+        self._loop = loop
+        self._ready = asyncio.Event()
+    
+    def _wake(self):
+        self._loop.call_soon_threadsafe(self._ready.set)
+    
+    async def get(self):
+        while True:
+            with self._condition:
+                item = self._pop()
+                if item is not None or self.closed:
+                    return item
+                self._ready.clear()
+            await self._ready.wait()
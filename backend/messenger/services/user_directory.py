@@ -0,0 +1,85 @@
+"""Process-wide directory of users by id.
+
+Message and thread protos only need a user's id and username, and usernames
+practically never change, so users are kept as prebuilt messaging_pb2.User
+objects instead of being joined or queried again for every response. The
+directory is warmed at startup with up to USER_DIRECTORY_SIZE users and loads
+any miss in one batched query. Past USER_DIRECTORY_SIZE the least recently
+used users are dropped.
+
+Anything that changes a user's name must call invalidate on every replica,
+MessagingService does that for the broadcast "user" event.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from messenger.config.database import session_scope
+from messenger.generated import messaging_pb2
+from messenger.models.user import User
+from messenger.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+USER_DIRECTORY_SIZE = int(os.getenv("USER_DIRECTORY_SIZE", "100000"))
+
+class UserDirectory:
+    def __init__(self, max_users=None):
+        self.max_users = max_users or USER_DIRECTORY_SIZE
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        
+        metrics.gauge("user_directory.users", lambda: len(self._users))
+    
+    def warm(self):
+        with session_scope() as db:
+            rows = db.query(User.id, User.username).order_by(User.id.desc()).limit(self.max_users).all()
+        self._store(rows)
+        logger.info(f"User directory warmed - users: {len(rows)}")
+    
+    def get(self, user_id):
+        # messaging_pb2.User for user_id, or None if there is no such user
+        return self.get_many([user_id]).get(user_id)
+    
+    def username(self, user_id):
+        user = self.get(user_id)
+        return user.username if user else "Unknown"
+    
+    def get_many(self, user_ids):
+        # {user_id: messaging_pb2.User}, users that don't exist are left out
+        found = {}
+        missing = set()
+        with self._lock:
+            for user_id in user_ids:
+                user = self._users.get(user_id)
+                if user is None:
+                    missing.add(user_id)
+                else:
+                    self._users.move_to_end(user_id)
+                    found[user_id] = user
+        
+        if found:
+            metrics.incr("user_directory.hits", len(found))
+        if missing:
+            metrics.incr("user_directory.misses", len(missing))
+            with session_scope() as db:
+                rows = db.query(User.id, User.username).filter(User.id.in_(missing)).all()
+            found.update(self._store(rows))
+        return found
+    
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+    
+    def _store(self, rows):
+        stored = {}
+        with self._lock:
+            for user_id, username in rows:
+                user = messaging_pb2.User(id=user_id, username=username)
+                self._users[user_id] = user
+                self._users.move_to_end(user_id)
+                stored[user_id] = user
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return stored
@@ -0,0 +1,68 @@
+"""Group commit for concurrent single-message writes.
+
+Every SendMessage used to run its own transaction, so a busy thread became a
+stream of tiny commits each waiting on its own fsync. With
+WRITE_BATCHING_ENABLED, SendMessage hands its message to a WriteBatcher
+instead and blocks until it is written. One writer thread collects whatever
+arrives within WRITE_BATCH_WINDOW_MS of the first message (at most
+WRITE_BATCH_MAX_MESSAGES), writes them with a single call and hands each
+caller its own result.
+
+A failed write fails every message in that batch. Each caller gets the
+exception.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from messenger.utils.metrics import metrics
+
+WRITE_BATCHING_ENABLED = os.getenv("WRITE_BATCHING_ENABLED", "false").lower() == "true"
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX_MESSAGES = int(os.getenv("WRITE_BATCH_MAX_MESSAGES", "64"))
+
+class WriteBatcher:
+    def __init__(self, write, max_batch=None, window_seconds=None):
+        # write(items) returns one result per item, in order
+        self.write = write
+        self.max_batch = max_batch or WRITE_BATCH_MAX_MESSAGES
+        self.window_seconds = window_seconds if window_seconds is not None else WRITE_BATCH_WINDOW_MS / 1000
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._run, name="write-batcher", daemon=True)
+        self._writer.start()
+        
+        metrics.gauge("write_batcher.queued", self._queue.qsize)
+    
+    def submit(self, item):
+        # blocks until the batch holding item is written, returns item's result
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+    
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                # past the window, only take what is already waiting
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            metrics.observe("write_batcher.batch_size", len(batch))
+            try:
+                results = self.write([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -1,14 +1,101 @@
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, UTC
 import jwt
 import grpc
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+
+from messenger.utils.metrics import metrics
 
 JWT_SECRET = os.getenv("JWT_SECRET", "some-secret-key")
 JWT_ALGORITHM = "HS256"
+# access tokens authenticate calls and are short-lived, refresh tokens only buy new
+# access tokens from AuthService.RefreshToken without another password check
+ACCESS_TOKEN_EXPIRY_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRY_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRY_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRY_DAYS", "30"))
+ACCESS_TOKEN = "access"
+REFRESH_TOKEN = "refresh"
+# decoded tokens kept in memory so repeat calls skip the signature check, 0 disables
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+class _TokenCache:
+    # LRU of sha256(token) -> (exp, user_id, username). An entry is never served
+    # at or past its exp, the same point where jwt.decode starts rejecting the token
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[0]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+_token_cache = _TokenCache(TOKEN_CACHE_SIZE)
+
+def issue_tokens(user_id: int, username: str) -> Tuple[str, str, int]:
+    # (access token, refresh token, seconds until the access token expires)
+    now = datetime.now(UTC)
+    access_token = jwt.encode({
+        "user_id": user_id,
+        "username": username,
+        "type": ACCESS_TOKEN,
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRY_MINUTES)
+    }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    refresh_token = jwt.encode({
+        "user_id": user_id,
+        "username": username,
+        "type": REFRESH_TOKEN,
+        "exp": now + timedelta(days=REFRESH_TOKEN_EXPIRY_DAYS)
+    }, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    return access_token, refresh_token, ACCESS_TOKEN_EXPIRY_MINUTES * 60
+
+def decode_refresh_token(token: str) -> Dict[str, Any]:
+    # raises jwt.InvalidTokenError (or its ExpiredSignatureError subclass) unless token is a valid refresh token
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    if payload.get('type') != REFRESH_TOKEN:
+        raise jwt.InvalidTokenError("Not a refresh token")
+    return {
+        'user_id': payload.get('user_id'),
+        'username': payload.get('username')
+    }
 
 def validate_jwt_token(token: str, context: grpc.ServicerContext) -> Optional[Dict[str, Any]]:
+    key = hashlib.sha256(token.encode('utf-8')).digest()
+    if TOKEN_CACHE_SIZE > 0:
+        entry = _token_cache.get(key)
+        if entry is not None:
+            metrics.incr("auth.token_cache_hits")
+            return {
+                'user_id': entry[1],
+                'username': entry[2]
+            }
+        metrics.incr("auth.token_cache_misses")
+    
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        # refresh tokens can't authenticate calls, tokens from before refresh tokens have no type
+        if payload.get('type', ACCESS_TOKEN) != ACCESS_TOKEN:
+            raise jwt.InvalidTokenError("Not an access token")
+        # tokens without an exp are never cached, there would be nothing to cap the entry at
+        if TOKEN_CACHE_SIZE > 0 and isinstance(payload.get('exp'), (int, float)):
+            _token_cache.put(key, (payload['exp'], payload.get('user_id'), payload.get('username')))
         return {
             'user_id': payload.get('user_id'),
             'username': payload.get('username')
@@ -20,4 +107,21 @@ def validate_jwt_token(token: str, context: grpc.ServicerContext) -> Optional[Di
     except jwt.InvalidTokenError:
         context.set_code(grpc.StatusCode.UNAUTHENTICATED)
         context.set_details("Invalid token")
-        return None
\ No newline at end of file
+        return None
+
+def bearer_token(metadata) -> Optional[str]:
+    # the jwt from an "authorization: Bearer <jwt>" metadata entry, None if there isn't one
+    for key, value in metadata or ():
+        if key == 'authorization' and isinstance(value, str):
+            scheme, _, token = value.partition(' ')
+            if scheme.lower() == 'bearer' and token.strip():
+                return token.strip()
+    return None
+
+def authenticate(request, context: grpc.ServicerContext) -> Optional[Dict[str, Any]]:
+    # identity the auth interceptor already verified from call metadata, falling back
+    # to the token in the request body for clients that don't send the header yet
+    user_info = getattr(context, 'user_info', None)
+    if user_info is not None:
+        return user_info
+    return validate_jwt_token(request.token, context)
@@ -0,0 +1,48 @@
+"""Process-local metrics.
+
+Counters and timings are recorded in-process. Gauges are callables that
+are evaluated when a snapshot is taken. main.py logs a snapshot every
+METRICS_LOG_INTERVAL_SECONDS.
+"""
+import threading
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self._gauges = {}
+    
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+    
+    def observe(self, name, value):
+        # keeps count/total/max, enough for averages and worst cases without storing samples
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += value
+            timing["max"] = max(timing["max"], value)
+    
+    def gauge(self, name, fn):
+        with self._lock:
+            self._gauges[name] = fn
+    
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self._counters)
+            for name, timing in self._timings.items():
+                snapshot[f"{name}.count"] = timing["count"]
+                snapshot[f"{name}.avg"] = timing["total"] / timing["count"] if timing["count"] else 0.0
+                snapshot[f"{name}.max"] = timing["max"]
+            gauges = list(self._gauges.items())
+        
+        for name, fn in gauges:
+            try:
+                snapshot[name] = fn()
+            except Exception:
+                snapshot[name] = None
+        return snapshot
+
+metrics = Metrics()
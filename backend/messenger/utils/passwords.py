@@ -0,0 +1,95 @@
+"""Password verification off the gRPC workers.
+
+bcrypt.checkpw is deliberately slow, so a burst of logins run on the request
+threads would starve every other RPC. Checks run in a small process pool
+instead (PASSWORD_HASH_WORKERS processes). At most PASSWORD_HASH_MAX_PENDING
+checks may be running or queued at once; beyond that check_password raises
+PasswordCheckBusy straight away and Login answers RESOURCE_EXHAUSTED, which
+keeps a login storm from tying up more than that many request threads.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from messenger.utils.metrics import metrics
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "4"))
+
+class PasswordCheckBusy(Exception):
+    pass
+
+def _checkpw(password, password_hash):
+    # runs in a pool process
+    return bcrypt.checkpw(password, password_hash)
+
+def _init_worker():
+    # hashing yields the CPU to request handling when cores are short
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+def _warm_up():
+    return None
+
+class PasswordChecker:
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or PASSWORD_HASH_WORKERS
+        self.max_pending = max_pending or PASSWORD_HASH_MAX_PENDING
+        self.pending = 0
+        self._pool = None
+        self._lock = threading.Lock()
+        
+        metrics.gauge("auth.password_checks_pending", lambda: self.pending)
+    
+    def _get_pool(self):
+        # called with the lock held; spawned rather than forked, forking a process
+        # that is already running gRPC threads isn't safe
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._pool
+    
+    def start(self):
+        # spawn the pool processes up front so the first logins don't pay for it
+        with self._lock:
+            pool = self._get_pool()
+        for future in [pool.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+    
+    def check_password(self, password, password_hash):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                metrics.incr("auth.password_checks_rejected")
+                raise PasswordCheckBusy()
+            self.pending += 1
+            pool = self._get_pool()
+        
+        started = time.perf_counter()
+        try:
+            return pool.submit(_checkpw, password.encode('utf-8'), password_hash.encode('utf-8')).result()
+        except BrokenProcessPool:
+            # a pool process died, start a fresh pool for the next check
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+            metrics.observe("auth.password_check_seconds", time.perf_counter() - started)
+    
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+password_checker = PasswordChecker()
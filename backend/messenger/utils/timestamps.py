@@ -0,0 +1,19 @@
+"""Unix timestamps for the protos.
+
+DateTime columns are naive and hold UTC. Values read back from the database
+are naive while the write paths build protos from the aware values they just
+wrote, so both must be converted the same way or a message's created_at would
+depend on the server's TZ.
+"""
+from datetime import datetime, UTC
+
+def to_timestamp(value: datetime) -> int:
+    # naive values are UTC, never local time
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return int(value.timestamp())
+
+def utc_now() -> datetime:
+    # naive UTC, as stored. An aware value would be shifted into the session's
+    # time zone by postgres when written to a timestamp without time zone column
+    return datetime.now(UTC).replace(tzinfo=None)
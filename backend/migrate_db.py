@@ -0,0 +1,147 @@
+import sys
+
+from sqlalchemy import bindparam, func, inspect, select, text, update
+
+from messenger.config.database import engine, get_db_session
+from messenger.models import User, Thread, ThreadParticipant, Message
+from messenger.services.search import create_search_backend
+
+def add_missing_columns(table):
+    # create_all only creates missing tables, so columns added to existing models
+    # have to be added by hand on databases created before them
+    existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+    added = []
+    
+    with engine.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(column.name)
+    
+    for column_name in added:
+        print(f"  Added column {table.name}.{column_name}")
+    return added
+
+def add_missing_indexes(table):
+    existing = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+    
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        index.create(bind=engine)
+        print(f"  Added index {index.name}")
+
+def backfill_last_messages(db):
+    ranked = db.query(
+        Message.id.label('id'),
+        func.row_number().over(
+            partition_by=Message.thread_id,
+            order_by=(Message.created_at.desc(), Message.id.desc())
+        ).label('rank')
+    ).subquery()
+    
+    rows = db.query(Message, User.username).join(
+        ranked, ranked.c.id == Message.id
+    ).outerjoin(User, User.id == Message.sender_id).filter(ranked.c.rank == 1).all()
+    
+    threads = {
+        thread.id: thread
+        for thread in db.query(Thread).filter(Thread.id.in_([message.thread_id for message, _ in rows]))
+    }
+    
+    updated = 0
+    for message, sender_username in rows:
+        thread = threads.get(message.thread_id)
+        if thread and thread.last_message_id != message.id:
+            thread.set_last_message(message, sender_username or "Unknown")
+            updated += 1
+    
+    db.commit()
+    print(f"  Backfilled last message for {updated} threads")
+
+def backfill_read_markers(db):
+    # only run when last_read_message_id was just added, so existing history doesn't
+    # all show up as unread. Later a null marker means the participant read nothing
+    updated = db.query(ThreadParticipant).filter(
+        ThreadParticipant.last_read_message_id.is_(None)
+    ).update({
+        ThreadParticipant.last_read_message_id: select(Thread.last_message_id).where(
+            Thread.id == ThreadParticipant.thread_id
+        ).scalar_subquery()
+    }, synchronize_session=False)
+    db.commit()
+    print(f"  Backfilled read markers for {updated} participants")
+
+def backfill_dm_keys(db):
+    # unnamed two-person threads get their DM pair. Where concurrent creates already
+    # left duplicate DMs the oldest one gets the key, the others stay plain threads
+    # so the unique index can still be built
+    pairs = db.query(
+        ThreadParticipant.thread_id,
+        func.min(ThreadParticipant.user_id),
+        func.max(ThreadParticipant.user_id)
+    ).join(Thread, Thread.id == ThreadParticipant.thread_id).filter(
+        Thread.name.is_(None),
+        Thread.dm_min_user_id.is_(None)
+    ).group_by(ThreadParticipant.thread_id).having(
+        func.count(ThreadParticipant.user_id) == 2
+    ).order_by(ThreadParticipant.thread_id).all()
+    
+    keyed = set(
+        db.query(Thread.dm_min_user_id, Thread.dm_max_user_id).filter(Thread.dm_min_user_id.isnot(None)).all()
+    )
+    
+    updates = []
+    skipped = 0
+    for thread_id, min_user_id, max_user_id in pairs:
+        if min_user_id == max_user_id:
+            continue
+        if (min_user_id, max_user_id) in keyed:
+            skipped += 1
+            continue
+        keyed.add((min_user_id, max_user_id))
+        updates.append({"thread_id_": thread_id, "dm_min_user_id_": min_user_id, "dm_max_user_id_": max_user_id})
+    
+    if updates:
+        # updated_at is set to itself, otherwise its onupdate default would move every
+        # DM to the top of the inbox with the time this script was imported
+        db.execute(
+            update(Thread.__table__).where(Thread.id == bindparam("thread_id_")).values(
+                dm_min_user_id=bindparam("dm_min_user_id_"),
+                dm_max_user_id=bindparam("dm_max_user_id_"),
+                updated_at=Thread.updated_at
+            ),
+            updates
+        )
+    db.commit()
+    print(f"  Backfilled DM key for {len(updates)} threads, {skipped} duplicate DMs left unkeyed")
+
+def main():
+    try:
+        print("Migrating database...")
+        add_missing_columns(Thread.__table__)
+        added_participant_columns = add_missing_columns(ThreadParticipant.__table__)
+        add_missing_indexes(Message.__table__)
+        
+        db = get_db_session()
+        backfill_last_messages(db)
+        backfill_dm_keys(db)
+        if 'last_read_message_id' in added_participant_columns:
+            backfill_read_markers(db)
+        db.close()
+        
+        # after the backfill, which leaves duplicate DMs unkeyed
+        add_missing_indexes(Thread.__table__)
+        
+        create_search_backend().create_index()
+        print("  Message search index ready")
+        
+        print("Database migrated")
+    except Exception as e:
+        print(f"Error migrating database: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
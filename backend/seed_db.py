@@ -56,6 +56,8 @@ def create_test_threads_and_messages(db, users):
         created_at=datetime.now(UTC)
     )
     db.add(message)
+    db.flush()
+    team_thread.set_last_message(message, robin.username)
     
     db.commit()
     print(f"  Created Team Legora thread with 1 message from Robin")
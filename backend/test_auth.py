@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the decoded-token cache in validate_jwt_token.
+"""
+
+import itertools
+import time
+from types import SimpleNamespace
+import grpc
+import jwt
+import pytest
+from conftest import FakeContext
+from messenger.utils import auth
+
+# every test signs its own tokens, so none of them starts out cached
+_user_ids = itertools.count(10 ** 6)
+
+@pytest.fixture
+def decodes(monkeypatch):
+    # counts the jwt.decode calls validate_jwt_token makes
+    calls = []
+    decode = jwt.decode
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+def make_token(**claims):
+    user_id = next(_user_ids)
+    return jwt.encode({"user_id": user_id, "username": f"user_{user_id}", **claims}, auth.JWT_SECRET, algorithm=auth.JWT_ALGORITHM)
+
+def validate(token):
+    context = FakeContext()
+    return auth.validate_jwt_token(token, context), context
+
+def test_repeat_validation_skips_decode(decodes):
+    token = make_token(exp=int(time.time()) + 60)
+
+    first, _ = validate(token)
+    second, _ = validate(token)
+
+    assert first == second
+    assert len(decodes) == 1
+
+def test_cached_token_is_decoded_again_exactly_at_exp(decodes, monkeypatch):
+    exp = int(time.time()) + 60
+    token = make_token(exp=exp)
+    clock = SimpleNamespace(time=lambda: exp - 1)
+    monkeypatch.setattr(auth, "time", clock)
+    validate(token)
+
+    clock.time = lambda: exp - 0.001
+    validate(token)
+    assert len(decodes) == 1
+
+    # from exp on the cache steps aside and jwt.decode decides
+    clock.time = lambda: exp
+    validate(token)
+    assert len(decodes) == 2
+
+def test_expired_token_is_rejected_after_being_cached():
+    exp = int(time.time()) + 1
+    token = make_token(exp=exp)
+    assert validate(token)[0] is not None
+
+    time.sleep(exp - time.time() + 0.05)
+    user_info, context = validate(token)
+
+    assert user_info is None
+    assert context.code == grpc.StatusCode.UNAUTHENTICATED
+    assert context.details == "Token has expired"
+
+def test_token_without_exp_is_never_cached(decodes):
+    token = make_token()
+
+    validate(token)
+    user_info, _ = validate(token)
+
+    assert user_info is not None
+    assert len(decodes) == 2
+
+def test_refresh_token_is_rejected_every_time(decodes):
+    _, refresh_token, _ = auth.issue_tokens(next(_user_ids), "refresher")
+
+    for _ in range(2):
+        user_info, context = validate(refresh_token)
+        assert user_info is None
+        assert context.code == grpc.StatusCode.UNAUTHENTICATED
+    # never cached, so the second call is checked from scratch too
+    assert len(decodes) == 2
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for GetMessages paging.
+"""
+
+import pytest
+from conftest import FakeContext
+from messenger.generated import messaging_pb2
+
+def get_messages(messenger, token, thread_id, **paging):
+    context = FakeContext()
+    response = messenger.service.GetMessages(messaging_pb2.GetMessagesRequest(
+        token=token,
+        thread_id=thread_id,
+        **paging
+    ), context)
+    assert context.code is None, context.details
+    return response
+
+@pytest.fixture
+def thread_with_messages(messenger):
+    # (token, thread_id, message ids oldest first) for a thread holding count messages
+    def create(count):
+        users = messenger.create_users("alice", "bob")
+        _, _, alice_token = users["alice"]
+        _, bob, _ = users["bob"]
+        thread = messenger.create_thread(alice_token, [bob], "paging")
+        message_ids = [messenger.send_message(alice_token, thread.id, f"message {i}").id for i in range(count)]
+        return alice_token, thread.id, message_ids
+    return create
+
+@pytest.mark.parametrize("paging", [{}, {"before_id": 10 ** 9}])
+def test_no_cursor_when_exactly_limit_messages_remain(messenger, thread_with_messages, paging):
+    token, thread_id, message_ids = thread_with_messages(10)
+
+    response = get_messages(messenger, token, thread_id, limit=10, **paging)
+
+    assert [message.id for message in response.messages] == message_ids[::-1]
+    assert response.next_cursor == 0
+
+def test_cursor_pages_through_thread(messenger, thread_with_messages):
+    token, thread_id, message_ids = thread_with_messages(25)
+
+    pages = []
+    cursor = 0
+    while True:
+        response = get_messages(messenger, token, thread_id, limit=10, before_id=cursor)
+        pages.append([message.id for message in response.messages])
+        cursor = response.next_cursor
+        if not cursor:
+            break
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert sum(pages, []) == message_ids[::-1]
+
+def test_after_id_cursor_stops_at_newest(messenger, thread_with_messages):
+    token, thread_id, message_ids = thread_with_messages(20)
+
+    response = get_messages(messenger, token, thread_id, limit=10, after_id=message_ids[9])
+
+    assert [message.id for message in response.messages] == message_ids[10:][::-1]
+    assert response.next_cursor == 0
+
+def test_created_at_matches_across_send_and_reads(messenger, thread_with_messages, non_utc_timezone):
+    token, thread_id, message_ids = thread_with_messages(3)
+    # the first page is cached from the database, then the sent message is merged in
+    get_messages(messenger, token, thread_id, limit=10)
+    sent = messenger.send_message(token, thread_id, "timed")
+
+    cached = get_messages(messenger, token, thread_id, limit=10).messages
+    loaded = get_messages(messenger, token, thread_id, limit=10, before_id=sent.id + 1).messages
+
+    assert cached[0].id == loaded[0].id == sent.id
+    assert cached[0].created_at == loaded[0].created_at == sent.created_at
+    assert [message.created_at for message in cached] == [message.created_at for message in loaded]
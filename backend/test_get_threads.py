@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for GetThreads and CreateThread.
+"""
+
+import pytest
+from conftest import FakeContext, QueryCounter
+from messenger.generated import messaging_pb2
+
+def get_threads(messenger, token):
+    context = FakeContext()
+    with QueryCounter() as counter:
+        response = messenger.service.GetThreads(messaging_pb2.GetThreadsRequest(token=token), context)
+    assert context.code is None, context.details
+    return response.threads, counter.count
+
+def test_create_thread(messenger):
+    users = messenger.create_users("alice", "bob", "carol")
+    _, alice, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    _, carol, _ = users["carol"]
+
+    thread = messenger.create_thread(alice_token, [bob, carol], "planning")
+
+    assert thread.name == "planning"
+    assert sorted(user.username for user in thread.participants) == sorted([alice, bob, carol])
+
+@pytest.mark.parametrize("name", ["planning", ""])
+def test_created_thread_matches_reloaded_proto(messenger, name, non_utc_timezone):
+    users = messenger.create_users("alice", "bob", "carol")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    _, carol, _ = users["carol"]
+    # unnamed with one other participant, so the second case is a new DM
+    participants = [bob, carol] if name else [bob]
+
+    thread = messenger.create_thread(alice_token, participants, name)
+
+    assert thread == messenger.service._load_thread_proto(thread.id)
+
+def test_get_threads_query_count_is_constant(messenger):
+    users = messenger.create_users("alice", "bob", "carol")
+    _, _, alice_token = users["alice"]
+    _, bob, bob_token = users["bob"]
+    _, carol, _ = users["carol"]
+
+    thread = messenger.create_thread(alice_token, [bob], "thread 0")
+    messenger.send_message(bob_token, thread.id, "hello 0")
+    # counted on the second call, once anything cached along the way is warm
+    get_threads(messenger, alice_token)
+    threads, one_thread_queries = get_threads(messenger, alice_token)
+    assert len(threads) == 1
+
+    for i in range(1, 20):
+        thread = messenger.create_thread(alice_token, [bob, carol], f"thread {i}")
+        messenger.send_message(bob_token, thread.id, f"hello {i}")
+    get_threads(messenger, alice_token)
+    threads, many_thread_queries = get_threads(messenger, alice_token)
+
+    assert len(threads) == 20
+    assert all(thread.last_message.content.startswith("hello") for thread in threads)
+    assert many_thread_queries == one_thread_queries
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for the backfills in migrate_db.py.
+"""
+
+from datetime import datetime
+from sqlalchemy import insert
+from messenger.config.database import session_scope
+from messenger.models import Thread, ThreadParticipant
+from migrate_db import backfill_dm_keys
+
+def test_dm_key_backfill_keeps_updated_at(messenger):
+    users = messenger.create_users("alice", "bob")
+    alice_id, _, _ = users["alice"]
+    bob_id, _, _ = users["bob"]
+    updated_at = datetime(2020, 1, 1)
+
+    # an unnamed two-person thread from before DM keys existed
+    with session_scope() as db:
+        thread_id = db.execute(insert(Thread.__table__).values(
+            created_at=updated_at,
+            updated_at=updated_at
+        )).inserted_primary_key[0]
+        db.execute(insert(ThreadParticipant.__table__), [
+            {"thread_id": thread_id, "user_id": user_id, "joined_at": updated_at}
+            for user_id in (alice_id, bob_id)
+        ])
+        db.commit()
+
+        backfill_dm_keys(db)
+
+        thread = db.query(Thread).filter(Thread.id == thread_id).one()
+        assert (thread.dm_min_user_id, thread.dm_max_user_id) == (min(alice_id, bob_id), max(alice_id, bob_id))
+        assert thread.updated_at == updated_at
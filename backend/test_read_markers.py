@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for MarkRead and the read markers and unread counts in GetThreads.
+"""
+
+import threading
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import update
+from conftest import FakeContext, QueryCounter
+from messenger.config.database import session_scope
+from messenger.generated import messaging_pb2
+from messenger.models import ThreadParticipant
+from messenger.services import messaging_service, read_markers as read_markers_module
+from messenger.services.read_markers import ReadMarkers
+
+@pytest.fixture(autouse=True)
+def read_markers(messenger, monkeypatch):
+    # only flushed by GetThreads and the tests themselves, never in the background
+    markers = ReadMarkers(flush_seconds=3600)
+    monkeypatch.setattr(messenger.service, "read_markers", markers)
+    yield markers
+    markers.stop()
+
+@pytest.fixture
+def pair(messenger):
+    # (alice's token, bob's user id and token, thread_id) for a thread between the two
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    bob_id, bob, bob_token = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "")
+    return alice_token, (bob_id, bob_token), thread.id
+
+def mark_read(messenger, token, thread_id, message_id):
+    response = messenger.service.MarkRead(messaging_pb2.MarkReadRequest(
+        token=token,
+        thread_id=thread_id,
+        message_id=message_id
+    ), FakeContext())
+    assert response.success, response.message
+
+def inbox(messenger, token):
+    # thread_id -> (last_read_message_id, unread_count)
+    context = FakeContext()
+    response = messenger.service.GetThreads(messaging_pb2.GetThreadsRequest(token=token), context)
+    assert context.code is None, context.details
+    return {thread.id: (thread.last_read_message_id, thread.unread_count) for thread in response.threads}
+
+def test_markers_only_move_forward(messenger, pair):
+    alice_token, (_, bob_token), thread_id = pair
+    message_ids = [messenger.send_message(bob_token, thread_id, f"message {i}").id for i in range(3)]
+
+    mark_read(messenger, alice_token, thread_id, message_ids[1])
+    mark_read(messenger, alice_token, thread_id, message_ids[0])
+    assert inbox(messenger, alice_token)[thread_id] == (message_ids[1], 1)
+
+    # an older marker after the flush doesn't move the stored one back either
+    mark_read(messenger, alice_token, thread_id, message_ids[0])
+    assert inbox(messenger, alice_token)[thread_id] == (message_ids[1], 1)
+
+def test_marker_past_newest_message_is_capped(messenger, pair):
+    alice_token, (_, bob_token), thread_id = pair
+    newest = messenger.send_message(bob_token, thread_id, "newest").id
+
+    mark_read(messenger, alice_token, thread_id, 10 ** 9)
+    assert inbox(messenger, alice_token)[thread_id] == (newest, 0)
+
+    # so the next message still counts as unread
+    messenger.send_message(bob_token, thread_id, "after")
+    assert inbox(messenger, alice_token)[thread_id] == (newest, 1)
+
+def test_own_messages_are_never_unread(messenger, pair, read_markers):
+    alice_token, (bob_id, bob_token), thread_id = pair
+    for i in range(2):
+        messenger.send_message(alice_token, thread_id, f"from alice {i}")
+        messenger.send_message(bob_token, thread_id, f"from bob {i}")
+    # without a marker bob has read nothing, only alice's messages count
+    read_markers.flush()
+    with session_scope() as db:
+        db.execute(update(ThreadParticipant).where(
+            ThreadParticipant.thread_id == thread_id,
+            ThreadParticipant.user_id == bob_id
+        ).values(last_read_message_id=None))
+        db.commit()
+
+    assert inbox(messenger, bob_token)[thread_id] == (0, 2)
+
+def test_unread_count_stops_at_cap(messenger, pair, monkeypatch):
+    alice_token, (_, bob_token), thread_id = pair
+    monkeypatch.setattr(messaging_service, "UNREAD_COUNT_CAP", 3)
+    for i in range(5):
+        messenger.send_message(bob_token, thread_id, f"message {i}")
+
+    assert inbox(messenger, alice_token)[thread_id] == (0, 3)
+
+def test_get_threads_flushes_only_callers_markers(messenger, pair, read_markers):
+    alice_token, (bob_id, bob_token), thread_id = pair
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(2)]
+    mark_read(messenger, bob_token, thread_id, message_ids[0])
+
+    # alice's inbox leaves bob's marker pending, his own flushes it
+    inbox(messenger, alice_token)
+    assert (thread_id, bob_id) in read_markers._pending
+    assert inbox(messenger, bob_token)[thread_id] == (message_ids[0], 1)
+    assert (thread_id, bob_id) not in read_markers._pending
+
+def test_get_threads_waits_for_background_flush_of_its_markers(messenger, pair, read_markers, monkeypatch):
+    alice_token, (bob_id, bob_token), thread_id = pair
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(2)]
+    mark_read(messenger, bob_token, thread_id, message_ids[1])
+
+    # the background flush takes bob's marker and then stalls before writing it
+    writing = threading.Event()
+    release = threading.Event()
+    session_scope = read_markers_module.session_scope
+    @contextmanager
+    def stalled_session_scope():
+        writing.set()
+        release.wait()
+        with session_scope() as db:
+            yield db
+    monkeypatch.setattr(read_markers_module, "session_scope", stalled_session_scope)
+    background = threading.Thread(target=read_markers.flush)
+    background.start()
+    assert writing.wait(5)
+    assert (thread_id, bob_id) not in read_markers._pending
+
+    threads = {}
+    reader = threading.Thread(target=lambda: threads.update(inbox(messenger, bob_token)))
+    try:
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()
+    finally:
+        release.set()
+        background.join(5)
+        reader.join(5)
+    assert threads[thread_id] == (message_ids[1], 0)
+
+def test_statement_count_is_constant(messenger):
+    def queries(thread_count):
+        # GetThreads for a reader with thread_count unread threads and a pending marker in each
+        users = messenger.create_users("reader", "writer")
+        _, _, reader_token = users["reader"]
+        _, writer, writer_token = users["writer"]
+        for i in range(thread_count):
+            thread = messenger.create_thread(reader_token, [writer], f"thread {i}")
+            message_ids = [messenger.send_message(writer_token, thread.id, f"message {j}").id for j in range(3)]
+            mark_read(messenger, reader_token, thread.id, message_ids[0])
+        with QueryCounter() as counter:
+            threads = inbox(messenger, reader_token)
+        assert len(threads) == thread_count
+        assert all(unread == 2 for _, unread in threads.values())
+        return counter.count
+
+    assert queries(10) == queries(1)
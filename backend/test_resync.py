@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for dropping event-fed caches when the broadcast bus may have lost events.
+"""
+
+import pytest
+from conftest import FakeContext
+from messenger.generated import messaging_pb2
+from messenger.services import broadcast
+from messenger.services.broadcast import RESYNC, InMemoryBus, PostgresBus
+from messenger.services.message_cache import RecentMessageCache
+from messenger.services.messaging_service import MessagingService
+
+@pytest.fixture
+def other_replica():
+    # a second replica on the same database whose bus never hears from the first one
+    service = MessagingService(bus=InMemoryBus())
+    yield service
+    service.read_markers.stop()
+
+def first_page(service, token, thread_id):
+    context = FakeContext()
+    response = service.GetMessages(messaging_pb2.GetMessagesRequest(token=token, thread_id=thread_id, limit=10), context)
+    assert context.code is None, context.details
+    return [message.id for message in response.messages]
+
+def test_resync_drops_pages_and_rings_missing_a_lost_message(messenger, other_replica):
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, bob_token = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "replicas")
+    before = messenger.send_message(alice_token, thread.id, "before").id
+    # the other replica caches the page and rings the message it hears about
+    assert first_page(other_replica, bob_token, thread.id) == [before]
+    other_replica._deliver_message(thread.id, before, messaging_pb2.Message(id=before, thread_id=thread.id).SerializeToString())
+
+    # its event never reaches the other replica
+    lost = messenger.send_message(alice_token, thread.id, "lost").id
+    assert first_page(other_replica, bob_token, thread.id) == [before]
+    # the ring still claims to cover everything after before
+    assert other_replica.replay.since(thread.id, before) == []
+
+    other_replica.bus._dispatch(RESYNC, {})
+
+    assert first_page(other_replica, bob_token, thread.id) == [lost, before]
+    assert other_replica.replay.since(thread.id, before) is None
+
+def test_fill_loaded_before_clear_is_not_stored():
+    cache = RecentMessageCache(page_size=10)
+    cache.begin_fill(1)
+    cache.clear()
+    cache.fill(1, [messaging_pb2.Message(id=1, thread_id=1)])
+
+    assert cache.get(1, 10) is None
+
+class RecordingEngine:
+    # stands in for the engine, keeps every NOTIFY payload, or fails them all
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.payloads = []
+
+    def connect(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement, parameters):
+        if self.fail:
+            raise RuntimeError("connection refused")
+        self.payloads.extend(parameter["payload"] for parameter in parameters)
+
+    def commit(self):
+        pass
+
+def test_failed_notify_sends_resync_with_the_next_one(monkeypatch):
+    bus = PostgresBus()
+    monkeypatch.setattr(broadcast, "engine", RecordingEngine(fail=True))
+    bus.publish("message", thread_id=1)
+
+    recording = RecordingEngine()
+    monkeypatch.setattr(broadcast, "engine", recording)
+    bus.publish("message", thread_id=2)
+    bus.publish("message", thread_id=3)
+
+    kinds = [bus._decode(payload)[1:] for payload in recording.payloads]
+    assert kinds == [(RESYNC, {}), ("message", {"thread_id": 2}), ("message", {"thread_id": 3})]
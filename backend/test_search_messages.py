@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for SearchMessages, against the SQLite FTS5 backend.
+"""
+
+import uuid
+import grpc
+import pytest
+from conftest import FakeContext
+from messenger.generated import messaging_pb2
+from messenger.services.search import SqliteSearch
+
+@pytest.fixture(scope="module", autouse=True)
+def search_index(messenger):
+    SqliteSearch().create_index()
+
+@pytest.fixture
+def word():
+    # a word no other test's messages contain
+    return "w" + uuid.uuid4().hex
+
+def search(messenger, token, query, **fields):
+    context = FakeContext()
+    response = messenger.service.SearchMessages(messaging_pb2.SearchMessagesRequest(
+        token=token,
+        query=query,
+        **fields
+    ), context)
+    return response, context
+
+def test_search_is_scoped_to_callers_threads(messenger, word):
+    users = messenger.create_users("alice", "bob", "carol", "dave")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    _, dave, _ = users["dave"]
+    _, _, carol_token = users["carol"]
+    alice_thread = messenger.create_thread(alice_token, [bob], "")
+    carol_thread = messenger.create_thread(carol_token, [dave], "")
+    visible = messenger.send_message(alice_token, alice_thread.id, f"the {word} report")
+    messenger.send_message(carol_token, carol_thread.id, f"another {word} report")
+
+    response, context = search(messenger, alice_token, word)
+
+    assert context.code is None, context.details
+    assert [hit.message.id for hit in response.hits] == [visible.id]
+    assert f"**{word}**" in response.hits[0].snippet
+
+    response, context = search(messenger, alice_token, word, thread_id=carol_thread.id)
+    assert context.code == grpc.StatusCode.PERMISSION_DENIED
+    assert not response.hits
+
+def test_cursor_pages_without_duplicates(messenger, word):
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "")
+    # different lengths give different ranks, repeats give ties
+    message_ids = {
+        messenger.send_message(alice_token, thread.id, f"{word} " + "filler " * (i % 3)).id
+        for i in range(7)
+    }
+
+    pages = []
+    cursor = ""
+    while True:
+        response, context = search(messenger, alice_token, word, thread_id=thread.id, limit=3, cursor=cursor)
+        assert context.code is None, context.details
+        pages.append([hit.message.id for hit in response.hits])
+        cursor = response.next_cursor
+        if not cursor:
+            break
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    found = sum(pages, [])
+    assert len(found) == len(set(found))
+    assert set(found) == message_ids
+
+@pytest.mark.parametrize("fields, details", [
+    ({"query": "   "}, "A search query is required"),
+    ({"query": "anything", "cursor": "not a cursor"}, "Invalid cursor"),
+])
+def test_invalid_query_or_cursor(messenger, fields, details):
+    users = messenger.create_users("alice")
+    _, _, alice_token = users["alice"]
+
+    response, context = search(messenger, alice_token, **fields)
+
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+    assert context.details == details
+    assert not response.hits
+
+def test_fts_syntax_in_query_is_matched_as_words(messenger, word):
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "")
+    message = messenger.send_message(alice_token, thread.id, f"deploy {word} or rollback")
+
+    # OR is a word to match, the quote and star are not operators
+    response, context = search(messenger, alice_token, f'{word}" OR rollback*')
+    assert context.code is None, context.details
+    assert [hit.message.id for hit in response.hits] == [message.id]
+
+    # NEAR( and a lone column filter would be syntax errors if passed through
+    for query in (f"NEAR({word}", f"content: {word} AND", "(", '"'):
+        response, context = search(messenger, alice_token, query)
+        assert context.code is None, f"{query}: {context.details}"
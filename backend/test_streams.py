@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Tests for StreamThreadMessages and StreamUserEvents, run in-process with a fake context.
+"""
+
+import re
+import grpc
+import pytest
+from conftest import Aborted, StreamContext
+from messenger.generated import messaging_pb2
+from messenger.services import messaging_service, subscriptions
+from messenger.services.replay import ReplayBuffer
+from messenger.utils.metrics import metrics
+
+@pytest.fixture
+def thread_pair(messenger):
+    # (alice's token, bob's token, thread_id) for a thread between the two
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, bob_token = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "stream")
+    return alice_token, bob_token, thread.id
+
+def stream_thread(messenger, token, thread_id, last_seen_message_id=0):
+    # (stream, context) with the connected status already read
+    context = StreamContext()
+    stream = messenger.service.StreamThreadMessages(messaging_pb2.StreamThreadMessagesRequest(
+        token=token,
+        thread_id=thread_id,
+        last_seen_message_id=last_seen_message_id
+    ), context)
+    assert next(stream).status.connected
+    return stream, context
+
+def read_until_cancelled(stream, context):
+    # every frame still due once the client goes away, decoded
+    context.cancel()
+    return [
+        messaging_pb2.MessageStreamResponse.FromString(frame) if isinstance(frame, bytes) else frame
+        for frame in stream
+    ]
+
+def frame(message_proto):
+    return messaging_pb2.MessageStreamResponse(new_message=message_proto).SerializeToString()
+
+def new_message_ids(responses):
+    return [response.new_message.id for response in responses]
+
+def test_thread_stream_ends_when_call_already_ended(messenger):
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    thread = messenger.create_thread(alice_token, [bob], "cancelled")
+
+    stream = messenger.service.StreamThreadMessages(messaging_pb2.StreamThreadMessagesRequest(
+        token=alice_token,
+        thread_id=thread.id
+    ), StreamContext(active=False))
+
+    assert list(stream) == []
+    assert thread.id not in messenger.service.subscribers
+
+def test_user_stream_ends_when_call_already_ended(messenger):
+    users = messenger.create_users("alice")
+    alice_id, _, alice_token = users["alice"]
+
+    stream = messenger.service.StreamUserEvents(messaging_pb2.StreamUserEventsRequest(
+        token=alice_token
+    ), StreamContext(active=False))
+
+    assert list(stream) == []
+    assert alice_id not in messenger.service.user_subscribers
+
+def test_resume_replays_from_ring(messenger, thread_pair):
+    alice_token, bob_token, thread_id = thread_pair
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(4)]
+    ring_hits = metrics.snapshot().get("stream.replay_ring_hits", 0)
+
+    stream, context = stream_thread(messenger, bob_token, thread_id, last_seen_message_id=message_ids[0])
+
+    assert new_message_ids(read_until_cancelled(stream, context)) == message_ids[1:]
+    assert metrics.snapshot()["stream.replay_ring_hits"] == ring_hits + 1
+
+def test_resume_falls_back_to_database_once_ring_is_evicted(messenger, thread_pair, monkeypatch):
+    alice_token, bob_token, thread_id = thread_pair
+    monkeypatch.setattr(messenger.service, "replay", ReplayBuffer(size=2))
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(5)]
+    fallbacks = metrics.snapshot().get("stream.replay_db_fallbacks", 0)
+
+    stream, context = stream_thread(messenger, bob_token, thread_id, last_seen_message_id=message_ids[0])
+
+    assert new_message_ids(read_until_cancelled(stream, context)) == message_ids[1:]
+    assert metrics.snapshot()["stream.replay_db_fallbacks"] == fallbacks + 1
+
+def test_resume_too_far_behind_sends_capped_missed_count(messenger, thread_pair, monkeypatch):
+    alice_token, bob_token, thread_id = thread_pair
+    monkeypatch.setattr(messenger.service, "replay", ReplayBuffer(size=1))
+    monkeypatch.setattr(messaging_service, "REPLAY_MAX_MESSAGES", 2)
+    monkeypatch.setattr(messaging_service, "MISSED_COUNT_CAP", 3)
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(6)]
+
+    stream, context = stream_thread(messenger, bob_token, thread_id, last_seen_message_id=message_ids[0])
+    responses = read_until_cancelled(stream, context)
+
+    assert len(responses) == 1
+    assert responses[0].missed.count == 3
+
+def test_late_lower_id_frame_is_delivered_after_replay(messenger, thread_pair):
+    alice_token, bob_token, thread_id = thread_pair
+    messages = [messenger.send_message(alice_token, thread_id, f"message {i}") for i in range(4)]
+    # messages[2] is committed late, so the ring doesn't have it yet
+    messenger.service.replay._rings[thread_id].remove((messages[2].id, frame(messages[2])))
+
+    stream, context = stream_thread(messenger, bob_token, thread_id, last_seen_message_id=messages[0].id)
+    # sent between subscribing and the replay, so it is both replayed and buffered live
+    during_replay = messenger.send_message(alice_token, thread_id, "during replay")
+    replayed = [messaging_pb2.MessageStreamResponse.FromString(next(stream)).new_message.id]
+    messenger.service._deliver_message(thread_id, messages[2].id, messages[2].SerializeToString())
+
+    replayed += new_message_ids(read_until_cancelled(stream, context))
+    assert replayed == [messages[1].id, messages[3].id, during_replay.id, messages[2].id]
+
+def test_slow_consumer_resumes_from_abort_details(messenger, thread_pair, monkeypatch):
+    alice_token, bob_token, thread_id = thread_pair
+    messenger.send_message(alice_token, thread_id, "before the stream")
+    monkeypatch.setattr(subscriptions, "STREAM_BUFFER_SIZE", 2)
+    monkeypatch.setattr(subscriptions, "STREAM_OVERFLOW_POLICY", subscriptions.DISCONNECT)
+
+    stream, context = stream_thread(messenger, bob_token, thread_id)
+    message_ids = [messenger.send_message(alice_token, thread_id, f"message {i}").id for i in range(3)]
+
+    with pytest.raises(Aborted):
+        list(stream)
+    assert context.code == grpc.StatusCode.RESOURCE_EXHAUSTED
+    last_seen_message_id = int(re.search(r"last_seen_message_id=(\d+)", context.details).group(1))
+
+    stream, context = stream_thread(messenger, bob_token, thread_id, last_seen_message_id=last_seen_message_id)
+    assert new_message_ids(read_until_cancelled(stream, context)) == message_ids
+
+def test_slow_consumer_on_empty_thread_is_told_to_refetch(messenger, thread_pair, monkeypatch):
+    alice_token, bob_token, thread_id = thread_pair
+    monkeypatch.setattr(subscriptions, "STREAM_BUFFER_SIZE", 2)
+    monkeypatch.setattr(subscriptions, "STREAM_OVERFLOW_POLICY", subscriptions.DISCONNECT)
+
+    stream, context = stream_thread(messenger, bob_token, thread_id)
+    for i in range(3):
+        messenger.send_message(alice_token, thread_id, f"message {i}")
+
+    with pytest.raises(Aborted):
+        list(stream)
+    assert context.details == messaging_service.SLOW_CONSUMER_DETAILS
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for group-committed SendMessage writes.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import grpc
+import pytest
+from conftest import FakeContext
+from messenger.config.database import session_scope
+from messenger.generated import messaging_pb2
+from messenger.models import Thread
+from messenger.services.write_batcher import WriteBatcher
+
+SENDS = 20
+
+@pytest.fixture
+def batching(messenger, monkeypatch):
+    # turns batching on with write as the batch writer, returns the sizes of the batches written
+    def enable(write):
+        sizes = []
+        def recording_write(rows):
+            sizes.append(len(rows))
+            return write(rows)
+        # wide enough that concurrent sends always share a batch
+        monkeypatch.setattr(messenger.service, "write_batcher", WriteBatcher(recording_write, window_seconds=0.2))
+        return sizes
+    return enable
+
+def send_concurrently(messenger, requests):
+    # every request sent from its own thread at the same moment, returns (response, context) pairs in order
+    barrier = threading.Barrier(len(requests))
+    def send(request):
+        context = FakeContext()
+        barrier.wait()
+        return messenger.service.SendMessage(request, context), context
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(send, requests))
+
+def thread_requests(messenger):
+    users = messenger.create_users("alice", "bob")
+    _, _, alice_token = users["alice"]
+    _, bob, _ = users["bob"]
+    threads = [messenger.create_thread(alice_token, [bob], f"batched {i}") for i in range(2)]
+    return [
+        messaging_pb2.SendMessageRequest(token=alice_token, thread_id=threads[i % 2].id, content=f"message {i}")
+        for i in range(SENDS)
+    ]
+
+def test_concurrent_sends_share_a_batch_and_get_their_own_message(messenger, batching):
+    sizes = batching(messenger.service._commit_messages)
+    requests = thread_requests(messenger)
+
+    results = send_concurrently(messenger, requests)
+
+    assert max(sizes) > 1
+    for request, (response, _) in zip(requests, results):
+        assert response.success, response.message
+        assert response.sent_message.content == request.content
+        assert response.sent_message.thread_id == request.thread_id
+    assert len({response.sent_message.id for response, _ in results}) == SENDS
+
+    with session_scope() as db:
+        for thread_id in {request.thread_id for request in requests}:
+            newest = max(response.sent_message.id for response, _ in results if response.sent_message.thread_id == thread_id)
+            assert db.query(Thread.last_message_id).filter(Thread.id == thread_id).scalar() == newest
+
+def test_failed_write_fails_every_send_in_the_batch(messenger, batching):
+    def failing_write(rows):
+        raise RuntimeError("database is gone")
+    sizes = batching(failing_write)
+
+    results = send_concurrently(messenger, thread_requests(messenger))
+
+    assert max(sizes) > 1
+    for response, context in results:
+        assert not response.success
+        assert context.code == grpc.StatusCode.INTERNAL
+        assert "database is gone" in context.details
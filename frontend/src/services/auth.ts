@@ -1,10 +1,12 @@
 import { AuthServiceClient } from '../generated/AuthServiceClientPb';
-import { LoginRequest, LoginResponse } from '../generated/auth_pb';
+import { LoginRequest, LoginResponse, RefreshTokenRequest, RefreshTokenResponse } from '../generated/auth_pb';
 import { AuthState, User } from '../types/auth';
 
 const AUTH_CLIENT = new AuthServiceClient('http://localhost:8080');
 const TOKEN_KEY = 'messenger_token';
 const USER_KEY = 'messenger_user';
+const REFRESH_TOKEN_KEY = 'messenger_refresh_token';
+const TOKEN_EXPIRES_KEY = 'messenger_token_expires_at';
 
 export class AuthService {
   static async login(username: string, password: string): Promise<AuthState> {
@@ -23,12 +25,13 @@ export class AuthService {
         
         const authState: AuthState = {
           token: response.getToken(),
+          refreshToken: response.getRefreshToken(),
           user,
           isAuthenticated: true
         };
 
         // Store in localStorage
-        localStorage.setItem(TOKEN_KEY, response.getToken());
+        this.storeTokens(response.getToken(), response.getRefreshToken(), response.getExpiresIn());
         localStorage.setItem(USER_KEY, JSON.stringify(user));
 
         return authState;
@@ -41,8 +44,47 @@ export class AuthService {
     }
   }
 
+  // Swaps the refresh token for a new token pair, no password needed
+  static async refresh(refreshToken: string): Promise<AuthState> {
+    const request = new RefreshTokenRequest();
+    request.setRefreshToken(refreshToken);
+
+    const response: RefreshTokenResponse = await AUTH_CLIENT.refreshToken(request);
+    if (!response.getSuccess()) {
+      throw new Error(response.getMessage() || 'Token refresh failed');
+    }
+
+    const user: User = {
+      id: response.getUserId(),
+      username: response.getUsername()
+    };
+
+    this.storeTokens(response.getToken(), response.getRefreshToken(), response.getExpiresIn());
+    localStorage.setItem(USER_KEY, JSON.stringify(user));
+
+    return {
+      token: response.getToken(),
+      refreshToken: response.getRefreshToken(),
+      user,
+      isAuthenticated: true
+    };
+  }
+
+  static getTokenExpiresAt(): number | null {
+    const expiresAt = localStorage.getItem(TOKEN_EXPIRES_KEY);
+    return expiresAt ? Number(expiresAt) : null;
+  }
+
+  private static storeTokens(token: string, refreshToken: string, expiresIn: number): void {
+    localStorage.setItem(TOKEN_KEY, token);
+    localStorage.setItem(REFRESH_TOKEN_KEY, refreshToken);
+    localStorage.setItem(TOKEN_EXPIRES_KEY, String(Date.now() + expiresIn * 1000));
+  }
+
   static logout(): void {
     localStorage.removeItem(TOKEN_KEY);
+    localStorage.removeItem(REFRESH_TOKEN_KEY);
+    localStorage.removeItem(TOKEN_EXPIRES_KEY);
     localStorage.removeItem(USER_KEY);
   }
 
@@ -55,6 +97,7 @@ export class AuthService {
         const user = JSON.parse(userStr);
         return {
           token,
+          refreshToken: localStorage.getItem(REFRESH_TOKEN_KEY),
           user,
           isAuthenticated: true
         };
@@ -66,6 +109,7 @@ export class AuthService {
 
     return {
       token: null,
+      refreshToken: null,
       user: null,
       isAuthenticated: false
     };
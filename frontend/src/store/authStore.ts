@@ -8,8 +8,39 @@ interface AuthStore extends AuthState {
   initializeAuth: () => void;
 }
 
+// Renew the token a minute before it expires, or halfway through for shorter-lived tokens
+const REFRESH_MARGIN_MS = 60 * 1000;
+let refreshTimer: ReturnType<typeof setTimeout> | null = null;
+
+const scheduleRefresh = () => {
+  if (refreshTimer) {
+    clearTimeout(refreshTimer);
+    refreshTimer = null;
+  }
+
+  const { refreshToken } = useAuthStore.getState();
+  const expiresAt = AuthService.getTokenExpiresAt();
+  if (!refreshToken || !expiresAt) {
+    return;
+  }
+
+  const remaining = expiresAt - Date.now();
+  const delay = Math.max(remaining - REFRESH_MARGIN_MS, remaining / 2, 0);
+  refreshTimer = setTimeout(async () => {
+    try {
+      const authState = await AuthService.refresh(refreshToken);
+      useAuthStore.setState(authState);
+      scheduleRefresh();
+    } catch (error) {
+      console.error('Token refresh failed:', error);
+      useAuthStore.getState().logout();
+    }
+  }, delay);
+};
+
 export const useAuthStore = create<AuthStore>((set, get) => ({
   token: null,
+  refreshToken: null,
   user: null,
   isAuthenticated: false,
 
@@ -17,6 +48,7 @@ export const useAuthStore = create<AuthStore>((set, get) => ({
     try {
       const authState = await AuthService.login(username, password);
       set(authState);
+      scheduleRefresh();
     } catch (error) {
       console.error('Login failed:', error);
       throw error;
@@ -24,9 +56,14 @@ export const useAuthStore = create<AuthStore>((set, get) => ({
   },
 
   logout: () => {
+    if (refreshTimer) {
+      clearTimeout(refreshTimer);
+      refreshTimer = null;
+    }
     AuthService.logout();
     set({
       token: null,
+      refreshToken: null,
       user: null,
       isAuthenticated: false
     });
@@ -35,5 +72,6 @@ export const useAuthStore = create<AuthStore>((set, get) => ({
   initializeAuth: () => {
     const storedAuth = AuthService.getStoredAuth();
     set(storedAuth);
+    scheduleRefresh();
   }
 }));
\ No newline at end of file